@@ -1,24 +1,26 @@
-import redis
+import base64
+import redis.asyncio as redis
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import get_settings
+from app.core.redis_config import get_redis
 from app.core.secrets import get_vault_client, TokenManager
-from app.database import SessionLocal
+from app.database import AsyncSessionLocal
 from app.models.auth import AuthorizedUser
 from app.schemas.auth import AuthPayload
+from app.services.user_cache import authorized_user_cache
 
 router = APIRouter()
 settings = get_settings()
-r = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 def get_token_manager() -> TokenManager:
@@ -27,29 +29,47 @@ def get_token_manager() -> TokenManager:
 
 
 @router.post("/auth")
-def auth_endpoint(
+async def auth_endpoint(
     payload: AuthPayload,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     token_manager: TokenManager = Depends(get_token_manager),
+    r: redis.Redis = Depends(get_redis),
 ):
-    user_entry = (
-        db.query(AuthorizedUser)
-        .filter(AuthorizedUser.user_id == payload.user_id)
-        .first()
+
+    async def load_username() -> Optional[str]:
+        user_entry = await db.scalar(
+            select(AuthorizedUser).where(AuthorizedUser.user_id == payload.user_id)
+        )
+        return user_entry.username if user_entry else None
+
+    username = await authorized_user_cache.get_username(
+        payload.user_id, load_username
     )
 
-    if not user_entry:
+    if username is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    if user_entry.username != payload.username:
+    if username != payload.username:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    token = token_manager.create_token(
-        user_id=payload.user_id, username=payload.username
+    token, claims = await run_in_threadpool(
+        token_manager.issue_token, user_id=payload.user_id, username=payload.username
     )
+
+    if settings.SESSION_KEY_MODE == "hkdf":
+        # The key is derived again from the token on every request, the
+        # client cannot derive it itself without the master key
+        session_key = await run_in_threadpool(
+            token_manager.derive_session_key, claims
+        )
+        return {
+            "session_token": token,
+            "session_key": base64.b64encode(session_key).decode("utf-8"),
+        }
+
     ephemeral_key = token_manager.generate_ephemeral_key_from_jwt(token=token)
 
-    r.setex(f"ephemeral:{token}", settings.JWT_EXPIRATION, ephemeral_key)
+    await r.setex(f"ephemeral:{token}", settings.JWT_EXPIRATION, ephemeral_key)
 
     return {
         "session_token": token,
@@ -1,24 +1,49 @@
 import base64
 
-import aiofiles
 import asyncio
+import hmac
+import hvac
 import json
-import redis
-import time
-from fastapi import APIRouter, HTTPException, Query
+import redis.asyncio as redis
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
 from fastapi.params import Depends
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.core.secrets import get_vault_client, TokenManager
 from app.core.config import get_settings
-from app.utils.chunking_utils import chunk_lua_script, refresh_chunks
-from app.utils.crypto_utils import encrypt_aes_gcm, sign_data
-from app.utils.encryption_utils import mock_encrypt
+from app.core.crypto_executor import crypto_executor
+from app.core.logging_config import configure_logger
+from app.core.redis_config import get_redis
+from app.services.script_registry import request_reload, script_registry
+from app.utils.chunk_cache import window_chunk_cache
+from app.utils.chunk_publishing import (
+    mark_script_active,
+    publish_window,
+    refresh_chunks,
+)
+from app.utils.chunking_utils import (
+    current_window,
+    diff_versions,
+    script_version,
+    script_version_key,
+)
+from app.utils.chunk_sealing import SigningKey, seal_chunks
+from app.utils.crypto_utils import key_manager, signing_key_material
+from app.utils.framing import (
+    BINARY_MEDIA_TYPE,
+    FLAG_RECORD_SIGNATURES,
+    encode_frame,
+    encode_header,
+    encode_record,
+    wants_binary,
+)
+from app.utils.response_cache import session_response_cache
 
 router = APIRouter()
 settings = get_settings()
-r = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0)
-
-chunked_script_length: int = 0
+logger = configure_logger()
 
 
 def get_token_manager() -> TokenManager:
@@ -26,74 +51,404 @@ def get_token_manager() -> TokenManager:
     return TokenManager(vault_client)
 
 
+async def get_session_key(
+    token: str, token_manager: TokenManager, r: redis.Redis
+) -> bytes:
+    """
+    Verify the token and return the ephemeral AES key of its session: read
+    from Redis, or derived from the token's claims with SESSION_KEY_MODE=hkdf.
+    """
+    payload = await run_in_threadpool(token_manager.verify_token, token)
+
+    if settings.SESSION_KEY_MODE == "hkdf":
+        return await run_in_threadpool(token_manager.derive_session_key, payload)
+
+    ephemeral_key = await r.get(f"ephemeral:{token}")
+    if not ephemeral_key:
+        raise HTTPException(status_code=401, detail="Session invalid or expired")
+
+    return ephemeral_key
+
+
+async def load_window(r: redis.Redis, script_id: str) -> tuple[int, Optional[dict]]:
+    """
+    Return the current time window of a script and its cached data.
+
+    A script nobody has requested recently has no published windows, so the
+    first request publishes the current one on demand. If the current window
+    is still missing, fall back to the previous one for a grace period
+    instead of failing every request right after the boundary.
+    """
+    if not script_registry.exists(script_id):
+        raise HTTPException(status_code=404, detail="Script not found")
+
+    await mark_script_active(r, script_id)
+
+    time_window = current_window()
+    window = await window_chunk_cache.get_window(r, script_id, time_window)
+    if window:
+        return time_window, window
+
+    previous_window = await window_chunk_cache.get_window(
+        r, script_id, time_window - 1
+    )
+    if previous_window:
+        logger.warning(
+            "chunk_window_grace_lookup", script_id=script_id, window=time_window
+        )
+        return time_window - 1, previous_window
+
+    await publish_window(r, script_id, script_registry.get_chunks, time_window)
+    return time_window, await window_chunk_cache.get_window(r, script_id, time_window)
+
+
+async def get_current_window(r: redis.Redis, script_id: str) -> tuple[int, dict]:
+    """Return the time window to serve from and its metadata and chunks."""
+    time_window, window = await load_window(r, script_id)
+
+    if not window:
+        raise HTTPException(status_code=404, detail="Chunks not available or expired")
+
+    return time_window, window
+
+
+async def get_chunk_signing_key() -> Optional[SigningKey]:
+    """Return the key for legacy per-chunk signatures, None unless SIGN_CHUNKS"""
+    if not settings.SIGN_CHUNKS:
+        return None
+    return await run_in_threadpool(signing_key_material)
+
+
+def b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
 @router.get("/script_chunk/{chunk_index}")
-def get_script_chunk(
+async def get_script_chunk(
+    request: Request,
     chunk_index: int,
     token: str = Query(...),
+    script_id: str = Query(settings.DEFAULT_SCRIPT_ID),
     token_manager: TokenManager = Depends(get_token_manager),
+    r: redis.Redis = Depends(get_redis),
 ):
-    global chunked_script_length
-    token_manager.verify_token(token)
+    """
+    Return one encrypted chunk, as base64 JSON or, with
+    ``Accept: application/octet-stream``, as a binary frame.
+    """
+    ephemeral_key = await get_session_key(token, token_manager, r)
 
-    ephemeral_key = r.get(f"ephemeral:{token}")
-    if not ephemeral_key:
-        raise HTTPException(status_code=401, detail="Session invalid or expired")
+    time_window, window = await get_current_window(r, script_id)
+    compression = window["metadata"]["compression"]
+    raw_chunk = window["chunks"].get(str(chunk_index))
 
-    if chunked_script_length == 0:
-        raise HTTPException(status_code=404, detail="Script not available")
+    if raw_chunk is None:
+        raise HTTPException(status_code=404, detail=f"Chunk {chunk_index} not found")
 
-    if chunk_index < 0 or chunk_index >= chunked_script_length:
-        raise HTTPException(status_code=404, detail="Chunk not found")
+    sealed = session_response_cache.get(token, script_id, time_window, chunk_index)
+    if sealed is None:
+        [(nonce, ciphertext)], signature = await crypto_executor.submit(
+            seal_chunks, [raw_chunk], ephemeral_key, await get_chunk_signing_key()
+        )
+        sealed = (nonce, ciphertext, signature)
+        session_response_cache.put(token, script_id, time_window, chunk_index, sealed)
 
-    time_window = int(time.time()) // 60
-    metadata_key = f"chunk_metadata:{time_window}"
-    metadata = r.get(metadata_key)
+    nonce, ciphertext, signature = sealed
 
-    if not metadata:
-        raise HTTPException(status_code=404, detail="Chunks not available or expired")
+    if wants_binary(request):
+        return Response(
+            encode_frame(
+                time_window, compression, [(chunk_index, nonce, ciphertext)], signature
+            ),
+            media_type=BINARY_MEDIA_TYPE,
+        )
+
+    response = {
+        "window": time_window,
+        "compression": compression,
+        "nonce": b64(nonce),
+        "ciphertext": b64(ciphertext),
+    }
+
+    if signature is not None:
+        response["signature"] = b64(signature)
+
+    return response
+
+
+@router.get("/script_chunks")
+async def get_script_chunks(
+    request: Request,
+    token: str = Query(...),
+    start: Optional[int] = Query(None, ge=0),
+    end: Optional[int] = Query(None, ge=0),
+    indices: Optional[list[int]] = Query(None),
+    script_id: str = Query(settings.DEFAULT_SCRIPT_ID),
+    token_manager: TokenManager = Depends(get_token_manager),
+    r: redis.Redis = Depends(get_redis),
+):
+    """
+    Return several chunks in one response. Either pass ``indices`` (repeated
+    query parameter) or a ``start``/``end`` range, where ``end`` is exclusive
+    and defaults to the number of chunks. Binary framing is negotiated like
+    for single chunks.
+    """
+    ephemeral_key = await get_session_key(token, token_manager, r)
+    time_window, window = await get_current_window(r, script_id)
+    compression = window["metadata"]["compression"]
+    chunk_count = len(window["chunks"])
+
+    if indices is None:
+        range_start = start or 0
+        range_end = chunk_count if end is None else end
+        indices = list(range(range_start, min(range_end, chunk_count)))
+    elif start is not None or end is not None:
+        raise HTTPException(
+            status_code=400, detail="Pass either indices or a start/end range"
+        )
+
+    if not indices:
+        raise HTTPException(status_code=400, detail="No chunks requested")
+
+    if len(indices) > settings.MAX_CHUNK_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.MAX_CHUNK_BATCH_SIZE} chunks per request",
+        )
+
+    raw_chunks = []
+    for chunk_index in indices:
+        raw_chunk = window["chunks"].get(str(chunk_index))
+        if raw_chunk is None:
+            raise HTTPException(
+                status_code=404, detail=f"Chunk {chunk_index} not found"
+            )
+        raw_chunks.append(raw_chunk)
+
+    sealed, signature = await crypto_executor.submit(
+        seal_chunks, raw_chunks, ephemeral_key, await get_chunk_signing_key()
+    )
+    records = [
+        (chunk_index, nonce, ciphertext)
+        for chunk_index, (nonce, ciphertext) in zip(indices, sealed)
+    ]
+
+    if wants_binary(request):
+        return Response(
+            encode_frame(time_window, compression, records, signature),
+            media_type=BINARY_MEDIA_TYPE,
+        )
+
+    response = {
+        "window": time_window,
+        "compression": compression,
+        "chunks": [
+            {"index": chunk_index, "nonce": b64(nonce), "ciphertext": b64(ciphertext)}
+            for chunk_index, nonce, ciphertext in records
+        ],
+    }
 
-    metadata = json.loads(metadata)
-    chunk_key = metadata["chunks"].get(str(chunk_index))
+    if signature is not None:
+        response["signature"] = b64(signature)
 
-    if not chunk_key:
-        raise HTTPException(status_code=404, detail="Chunk {chunk_index} not found")
+    return response
 
-    raw_chunk = r.get(chunk_key)
 
-    encrypted_chunk = mock_encrypt(raw_chunk)
+async def stream_chunks(
+    time_window: int, window: dict, ephemeral_key: bytes, binary: bool
+) -> AsyncIterator[bytes]:
+    """
+    Encrypt and yield the chunks of a window one at a time, either as NDJSON
+    lines or as binary records after a frame header.
+    """
+    order = window["metadata"]["order"]
+    compression = window["metadata"]["compression"]
+    signing_key = await get_chunk_signing_key()
 
-    if isinstance(encrypted_chunk, str):
-        chunk_bytes = encrypted_chunk.encode("utf-8")
+    if binary:
+        flags = FLAG_RECORD_SIGNATURES if settings.SIGN_CHUNKS else 0
+        yield encode_header(time_window, compression, len(order), flags)
     else:
-        chunk_bytes = encrypted_chunk
+        header = {
+            "window": time_window,
+            "compression": compression,
+            "count": len(order),
+        }
+        yield (json.dumps(header) + "\n").encode()
+
+    for chunk_index in order:
+        raw_chunk = window["chunks"][str(chunk_index)]
+        [(nonce, ciphertext)], signature = await crypto_executor.submit(
+            seal_chunks,
+            [raw_chunk],
+            ephemeral_key,
+            signing_key,
+            bounded=False,
+        )
+
+        if binary:
+            yield encode_record(chunk_index, nonce, ciphertext, signature)
+            continue
+
+        frame = {
+            "index": chunk_index,
+            "nonce": b64(nonce),
+            "ciphertext": b64(ciphertext),
+        }
+        if signature is not None:
+            frame["signature"] = b64(signature)
+
+        yield (json.dumps(frame) + "\n").encode()
+
+
+@router.get("/script_stream")
+async def get_script_stream(
+    request: Request,
+    token: str = Query(...),
+    script_id: str = Query(settings.DEFAULT_SCRIPT_ID),
+    token_manager: TokenManager = Depends(get_token_manager),
+    r: redis.Redis = Depends(get_redis),
+):
+    """
+    Stream every chunk of the current window as NDJSON. The first line holds
+    the window and chunk count, each following line one encrypted chunk in
+    the shuffled order of the window. Chunks are encrypted as they are written.
+    With ``Accept: application/octet-stream`` the same data is streamed as a
+    binary frame with per-record signatures.
+    """
+    ephemeral_key = await get_session_key(token, token_manager, r)
+    time_window, window = await get_current_window(r, script_id)
+    binary = wants_binary(request)
+
+    # Admission happens once up front; a started stream can no longer 503
+    crypto_executor.check_capacity()
 
-    encrypted_data = encrypt_aes_gcm(chunk_bytes, ephemeral_key)
+    return StreamingResponse(
+        stream_chunks(time_window, window, ephemeral_key, binary),
+        media_type=BINARY_MEDIA_TYPE if binary else "application/x-ndjson",
+    )
 
-    combined_for_signing = base64.b64decode(
-        encrypted_data["nonce"]
-    ) + base64.b64decode(encrypted_data["ciphertext"])
-    signature_b64 = sign_data(combined_for_signing)
+
+@router.get("/manifest")
+async def get_chunk_manifest(
+    token: str = Query(...),
+    script_id: str = Query(settings.DEFAULT_SCRIPT_ID),
+    token_manager: TokenManager = Depends(get_token_manager),
+    r: redis.Redis = Depends(get_redis),
+):
+    """
+    Return the signed list of chunk hashes for the current time window.
+    Clients verify the signature once and then check every decrypted chunk
+    against its hash instead of verifying a signature per chunk.
+    """
+    await run_in_threadpool(token_manager.verify_token, token)
+
+    _, window = await load_window(r, script_id)
+
+    if not window or not window["manifest"]:
+        raise HTTPException(status_code=404, detail="Manifest not available or expired")
+
+    return window["manifest"]
+
+
+@router.get("/script_delta")
+async def get_script_delta(
+    token: str = Query(...),
+    since: str = Query(..., pattern=r"^[0-9a-f]{16}$"),
+    script_id: str = Query(settings.DEFAULT_SCRIPT_ID),
+    token_manager: TokenManager = Depends(get_token_manager),
+    r: redis.Redis = Depends(get_redis),
+):
+    """
+    Tell a client holding script version ``since`` what to download to get
+    to the current version: the indices of ``changed`` chunks, plus
+    ``moved`` chunks it can copy from an old index. Everything else is
+    unchanged; chunks at or past ``count`` are dropped.
+    """
+    await run_in_threadpool(token_manager.verify_token, token)
+
+    time_window, window = await get_current_window(r, script_id)
+    chunk_hashes = window["metadata"]["chunks"]
+    current_hashes = [chunk_hashes[str(idx)] for idx in range(len(chunk_hashes))]
+
+    old_hashes = await r.get(script_version_key(script_id, since))
+    if old_hashes is None:
+        raise HTTPException(
+            status_code=404, detail="Unknown version, fetch every chunk"
+        )
 
     return {
-        "nonce": encrypted_data["nonce"],
-        "ciphertext": encrypted_data["ciphertext"],
-        "signature": signature_b64,
+        "window": time_window,
+        "since": since,
+        "version": script_version(current_hashes),
+        **diff_versions(json.loads(old_hashes), current_hashes),
     }
 
 
-# FIXME
-@router.on_event("startup")
-async def startup_event() -> None:
-    global chunked_script_length
+@router.get("/public_key")
+async def get_public_key(
+    token: str = Query(...),
+    key_id: Optional[str] = Query(None, pattern=r"^[0-9]+$"),
+    token_manager: TokenManager = Depends(get_token_manager),
+):
+    """
+    Return the PEM public key and signature algorithm of a key pair, the
+    active one unless ``key_id`` (e.g. from a manifest) is given.
+    """
+    await run_in_threadpool(token_manager.verify_token, token)
+
+    if key_id is None:
+        key_id = await run_in_threadpool(key_manager.get_active_key_id)
+
     try:
-        async with aiofiles.open(
-            "app/assets/private_script.lua", mode="r"
-        ) as lua_file:
-            lua_script = await lua_file.read()
-            chunk_size = 10
-            interval = 60
-            chunks = await chunk_lua_script(lua_script, chunk_size)
-            chunked_script_length = len(chunks)
-            asyncio.create_task(refresh_chunks(chunks, interval))
-    except Exception as e:
-        print(f"Error during startup: {e}")
+        return await run_in_threadpool(key_manager.get_public_key, key_id)
+    except hvac.exceptions.InvalidPath:
+        raise HTTPException(status_code=404, detail="Key not found")
+
+
+@router.get("/scripts")
+async def list_scripts(
+    token: str = Query(...),
+    token_manager: TokenManager = Depends(get_token_manager),
+):
+    """Return the ids of the scripts that can be requested."""
+    await run_in_threadpool(token_manager.verify_token, token)
+    return {"scripts": await run_in_threadpool(script_registry.list_scripts)}
+
+
+@router.post("/script/reload", status_code=202)
+async def reload_script(
+    script_id: str = Query(settings.DEFAULT_SCRIPT_ID),
+    x_admin_key: Optional[str] = Header(None),
+    r: redis.Redis = Depends(get_redis),
+):
+    """
+    Make every worker re-read a script from disk within
+    SCRIPT_WATCH_INTERVAL seconds. The new version is published from the
+    next time window on. Requires the ``X-Admin-Key`` header.
+    """
+    if not (
+        settings.ADMIN_API_KEY
+        and x_admin_key
+        and hmac.compare_digest(x_admin_key, settings.ADMIN_API_KEY)
+    ):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    if not script_registry.exists(script_id):
+        raise HTTPException(status_code=404, detail="Script not found")
+
+    generation = await request_reload(r, script_id)
+    logger.info("script_reload_requested", script_id=script_id, generation=generation)
+    return {"script_id": script_id, "generation": generation}
+
+
+async def start_chunk_refresher(redis_client: redis.Redis) -> asyncio.Task:
+    """Keep the windows of every active script published in Redis."""
+    await mark_script_active(redis_client, settings.DEFAULT_SCRIPT_ID)
+
+    logger.info("chunk_refresher_started")
+    return asyncio.create_task(
+        refresh_chunks(
+            redis_client, script_registry.get_chunks, settings.CHUNK_REFRESH_INTERVAL
+        )
+    )
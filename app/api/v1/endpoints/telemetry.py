@@ -1,24 +1,20 @@
-import redis
 from fastapi import APIRouter, Query, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import get_settings
 from app.core.secrets import get_vault_client, TokenManager
-from app.database import SessionLocal
+from app.database import AsyncSessionLocal
 from app.models.telemetry import Telemetry
 from app.schemas.telemetry import TelemetryPayload
 
 router = APIRouter()
 settings = get_settings()
-r = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 def get_token_manager() -> TokenManager:
@@ -27,13 +23,13 @@ def get_token_manager() -> TokenManager:
 
 
 @router.post("/telemetry")
-def telemetry_endpoint(
+async def telemetry_endpoint(
     payload: TelemetryPayload,
     token: str = Query(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     token_manager: TokenManager = Depends(get_token_manager),
 ):
-    decoded = token_manager.verify_token(token)
+    decoded = await run_in_threadpool(token_manager.verify_token, token)
     user_id = decoded["uid"]
 
     telemetry_entry = Telemetry(
@@ -41,6 +37,6 @@ def telemetry_endpoint(
     )
 
     db.add(telemetry_entry)
-    db.commit()
+    await db.commit()
 
     return {"status": "logged"}
@@ -1,16 +1,24 @@
 import os
 from dataclasses import field
 from functools import lru_cache
+from typing import Optional
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "postgresql+psycopg2://user:pass@db:5432/anti_leak"
+    ASYNC_DATABASE_URL: Optional[str] = None  # Derived from DATABASE_URL if unset
     DB_POOL_SIZE: int = 20
     DB_MAX_OVERFLOW: int = 10
     DB_POOL_TIMEOUT: int = 30
     DB_POOL_RECYCLE: int = 1800
 
+    USER_CACHE_MAX_ENTRIES: int = 100000  # Per worker, 0 disables the cache
+    USER_CACHE_TTL: int = 300
+    USER_CACHE_NEGATIVE_TTL: int = 30  # For user ids that are not authorized
+    USER_CACHE_MEMORY_TTL: int = 30  # Worker memory, if an invalidation is missed
+
     RATE_LIMIT: int = 100
     RATE_LIMIT_WINDOW: int = 60
 
@@ -25,6 +33,8 @@ class Settings(BaseSettings):
 
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION: int = 600
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000  # Verified tokens per worker, 0 disables
+    SESSION_KEY_MODE: str = "redis"  # redis (revocable) or hkdf (stateless)
     CORS_ORIGINS: list[str] = field(
         default_factory=lambda: ["*"]
     )  # TODO: Update this with the actual frontend URL
@@ -40,6 +50,42 @@ class Settings(BaseSettings):
     VAULT_ADDRESS: str = None
     VAULT_TOKEN: str = None
     VAULT_MOUNT_POINT: str = None
+    SECRET_CACHE_TTL: int = 300  # 0 reads Vault on every lookup
+    SECRET_REFRESH_INTERVAL: int = 60
+    SECRET_STALE_SECONDS: int = 3600  # Served past the TTL while Vault is down
+
+    SIGNATURE_ALGORITHM: str = "rsa"  # rsa (PKCS#1 v1.5, SHA-256) or ed25519
+    ACTIVE_SIGNING_KEY_PATH: str = "active_rsa_key"
+    SIGNING_KEY_PREFIX: str = "rsa_key_"
+    SIGNING_KEY_CHECK_INTERVAL: int = 30
+    SIGN_CHUNKS: bool = False  # Legacy per-chunk signatures next to the manifest
+    MAX_CHUNK_BATCH_SIZE: int = 256
+    CRYPTO_EXECUTOR: str = "thread"  # thread or process
+    CRYPTO_WORKERS: Optional[int] = None  # Defaults to the CPU count
+    CRYPTO_QUEUE_SIZE: int = 256
+    CRYPTO_RETRY_AFTER_SECONDS: int = 1
+    SESSION_RESPONSE_CACHE_BYTES: int = 32 * 1024 * 1024  # 0 disables the cache
+    SCRIPTS_DIR: str = "app/assets"
+    DEFAULT_SCRIPT_ID: str = "private_script"
+    SCRIPT_CACHE_MAX_ENTRIES: int = 8
+    SCRIPT_IDLE_SECONDS: int = 600
+    SCRIPT_VERSION_TTL_SECONDS: int = 7 * 24 * 3600  # How long deltas can be served
+    SCRIPT_TRANSFORM: bool = True  # Minify before chunking
+    SCRIPT_RENAME_LOCALS: bool = True
+    SCRIPT_ENCODE_STRINGS: bool = True
+    SCRIPT_RENAME_SALT: str = ""
+    SCRIPT_TRANSFORM_WORKERS: int = 1  # Process pool size, 0 transforms inline
+    SCRIPT_WATCH_INTERVAL: int = 5  # Seconds between reload checks, 0 disables
+    ADMIN_API_KEY: Optional[str] = None  # Admin endpoints are disabled without one
+    CHUNK_TARGET_BYTES: int = 2048
+    CHUNK_COMPRESSION: str = "none"  # none, zlib or zstd (needs zstandard)
+    CHUNK_COMPRESSION_LEVEL: int = 6
+
+    CHUNK_WINDOW_SECONDS: int = 60
+    CHUNK_TTL_SECONDS: Optional[int] = None  # Defaults to three windows, see below
+    CHUNK_PRESTAGE_SECONDS: int = 15
+    CHUNK_REFRESH_INTERVAL: int = 5
+    CHUNK_REFRESH_LEASE_TTL: int = 30
 
     class Config:
         if os.getenv("ENV", "prod") == "dev":
@@ -52,6 +98,27 @@ class Settings(BaseSettings):
     def is_development(self) -> bool:
         return self.DEBUG
 
+    @property
+    def chunk_ttl_seconds(self) -> int:
+        """
+        How long a published window stays in Redis: staged ahead, current
+        and previous (grace) window, unless CHUNK_TTL_SECONDS overrides it.
+        """
+        if self.CHUNK_TTL_SECONDS is not None:
+            return self.CHUNK_TTL_SECONDS
+        return 3 * self.CHUNK_WINDOW_SECONDS
+
+    @model_validator(mode="after")
+    def check_chunk_ttl(self) -> "Settings":
+        # Metadata expiring within its window is never republished
+        minimum = 2 * self.CHUNK_WINDOW_SECONDS + self.CHUNK_PRESTAGE_SECONDS
+        if self.chunk_ttl_seconds < minimum:
+            raise ValueError(
+                f"CHUNK_TTL_SECONDS must be at least {minimum} seconds "
+                "(two windows plus CHUNK_PRESTAGE_SECONDS)"
+            )
+        return self
+
 
 @lru_cache()
 def get_settings() -> Settings:
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+from app.core.logging_config import configure_logger
+from app.monitoring.metrics import (
+    CRYPTO_QUEUE_DEPTH,
+    CRYPTO_REJECTIONS,
+    CRYPTO_SERVICE_SECONDS,
+    CRYPTO_WAIT_SECONDS,
+)
+
+logger = configure_logger()
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+class CryptoExecutorBusy(HTTPException):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(
+            status_code=503,
+            detail="Server busy, retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def _timed(fn: Callable[..., T], *args) -> tuple[T, float, float]:
+    """Run fn in the worker and report when it started and how long it took"""
+    started_at = time.time()
+    result = fn(*args)
+    return result, started_at, time.time() - started_at
+
+
+class CryptoExecutor:
+    """
+    Dedicated pool for chunk encryption and signing, so a burst of chunk
+    requests queues here instead of in the default threadpool that every
+    other endpoint shares.
+
+    At most ``workers + queue_size`` tasks are accepted at once; beyond that
+    ``submit`` fails fast with a 503 instead of letting requests pile up.
+    ``kind="process"`` side-steps the GIL at the cost of pickling arguments,
+    in which case ``fn`` must be a module-level function of a module that
+    is cheap to import, such as ``app.utils.chunk_sealing``.
+    """
+
+    def __init__(
+        self,
+        kind: str = settings.CRYPTO_EXECUTOR,
+        workers: Optional[int] = settings.CRYPTO_WORKERS,
+        queue_size: int = settings.CRYPTO_QUEUE_SIZE,
+        retry_after: int = settings.CRYPTO_RETRY_AFTER_SECONDS,
+    ) -> None:
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported crypto executor: {kind}")
+
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = self.workers + queue_size
+        self.retry_after = retry_after
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            executor_class = (
+                ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+            )
+            self._executor = executor_class(max_workers=self.workers)
+            logger.info("crypto_executor_started", kind=self.kind, workers=self.workers)
+        return self._executor
+
+    def check_capacity(self) -> None:
+        """Reject early if no task could be accepted right now"""
+        if self._in_flight >= self.capacity:
+            CRYPTO_REJECTIONS.inc()
+            raise CryptoExecutorBusy(self.retry_after)
+
+    async def submit(self, fn: Callable[..., T], *args, bounded: bool = True) -> T:
+        """
+        Run ``fn(*args)`` on the crypto pool. Unbounded submissions skip the
+        capacity check, for work that was already admitted (e.g. the chunks
+        of a stream that has started).
+        """
+        if bounded:
+            self.check_capacity()
+
+        self._in_flight += 1
+        CRYPTO_QUEUE_DEPTH.set(self._in_flight)
+        submitted_at = time.time()
+        loop = asyncio.get_running_loop()
+
+        try:
+            result, started_at, service_time = await loop.run_in_executor(
+                self._get_executor(), _timed, fn, *args
+            )
+        finally:
+            self._in_flight -= 1
+            CRYPTO_QUEUE_DEPTH.set(self._in_flight)
+
+        CRYPTO_WAIT_SECONDS.observe(max(started_at - submitted_at, 0.0))
+        CRYPTO_SERVICE_SECONDS.observe(service_time)
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+crypto_executor = CryptoExecutor()
@@ -1,31 +1,51 @@
 import base64
 import structlog
+import threading
 import time
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
 from datetime import datetime, timezone
+from typing import Optional
 
 from app.core.secrets import VaultClient
 from app.core.config import get_settings
+from app.monitoring.metrics import SIGNING_KEY_CACHE
 
 settings = get_settings()
 logger = structlog.get_logger()
 
+SIGNATURE_ALGORITHMS = ("rsa", "ed25519")
+
 
 class KeyManager:
     def __init__(self, vault_client: VaultClient) -> None:
+        if settings.SIGNATURE_ALGORITHM not in SIGNATURE_ALGORITHMS:
+            raise ValueError(
+                f"Unsupported signature algorithm: {settings.SIGNATURE_ALGORITHM}"
+            )
+
         self.vault_client = vault_client
         self.mount_point = settings.VAULT_MOUNT_POINT
-        self.active_key_path = "active_rsa_key"  # TODO: Move to settings
-        self.key_prefix = "rsa_key_"  # TODO: Move to settings
+        self.active_key_path = settings.ACTIVE_SIGNING_KEY_PATH
+        self.key_prefix = settings.SIGNING_KEY_PREFIX
+        self.algorithm = settings.SIGNATURE_ALGORITHM
+        self.key_check_interval = settings.SIGNING_KEY_CHECK_INTERVAL
+        self._signing_keys: Optional[dict[str, any]] = None
+        self._signing_keys_checked_at: float = 0.0
+        self._signing_keys_lock = threading.Lock()
 
     @staticmethod
-    def generate_key_pair() -> (bytes, bytes):
-        """Generate a new RSA key pair"""
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048,
-        )
+    def generate_key_pair(algorithm: str = "rsa") -> (bytes, bytes):
+        """Generate a new RSA or Ed25519 key pair"""
+        if algorithm == "rsa":
+            private_key = rsa.generate_private_key(
+                public_exponent=65537,
+                key_size=2048,
+            )
+        elif algorithm == "ed25519":
+            private_key = ed25519.Ed25519PrivateKey.generate()
+        else:
+            raise ValueError(f"Unsupported signature algorithm: {algorithm}")
 
         private_pem = private_key.private_bytes(
             encoding=serialization.Encoding.PEM,
@@ -42,9 +62,9 @@ class KeyManager:
         return private_pem, public_pem
 
     def rotate_keys(self) -> None:
-        """Generate and store a new RSA key pair"""
+        """Generate and store a new key pair for the configured algorithm"""
         try:
-            private_pem, public_pem = self.generate_key_pair()
+            private_pem, public_pem = self.generate_key_pair(self.algorithm)
 
             key_id = f"{int(time.time())}"
 
@@ -53,6 +73,7 @@ class KeyManager:
                 secret={
                     "private_key": base64.b64encode(private_pem).decode("utf-8"),
                     "public_key": base64.b64encode(public_pem).decode("utf-8"),
+                    "algorithm": self.algorithm,
                     "created_at": datetime.now(timezone.utc).isoformat(),
                 },
                 mount_point=self.mount_point,
@@ -64,36 +85,119 @@ class KeyManager:
                 mount_point=self.mount_point,
             )
 
-            logger.info("key_rotation_successful", key_id=key_id)
+            self.invalidate_signing_keys()
+
+            logger.info(
+                "key_rotation_successful", key_id=key_id, algorithm=self.algorithm
+            )
             return key_id
         except Exception as e:
             logger.error("key_rotation_failed", error=str(e))
             raise
 
-    def get_active_key(self) -> dict[str, bytes]:
+    def get_active_key_id(self) -> str:
+        """Get the id of the currently active key pair"""
+        active_key_data = self.vault_client.client.secrets.kv.v2.read_secret_version(
+            path=self.active_key_path, mount_point=self.mount_point
+        )
+        return active_key_data["data"]["data"]["active_key_id"]
+
+    def _read_key_pair(self, key_id: str) -> dict[str, any]:
+        """
+        Read the PEM encoded key pair stored under the given key id. Pairs
+        stored before the algorithm was recorded are RSA.
+        """
+        key_data = self.vault_client.client.secrets.kv.v2.read_secret_version(
+            path=f"{self.key_prefix}{key_id}", mount_point=self.mount_point
+        )
+
+        return {
+            "private_key": base64.b64decode(key_data["data"]["data"]["private_key"]),
+            "public_key": base64.b64decode(key_data["data"]["data"]["public_key"]),
+            "algorithm": key_data["data"]["data"].get("algorithm", "rsa"),
+        }
+
+    def get_public_key(self, key_id: str) -> dict[str, str]:
+        """Return the PEM public key and algorithm of a key pair"""
+        key_pair = self._read_key_pair(key_id)
+        return {
+            "key_id": key_id,
+            "algorithm": key_pair["algorithm"],
+            "public_key": key_pair["public_key"].decode("utf-8"),
+        }
+
+    def get_active_key(self) -> dict[str, any]:
         """Get the currently active key pair"""
         try:
-            active_key_data = (
-                self.vault_client.client.secrets.kv.v2.read_secret_version(
-                    path=self.active_key_path, mount_point=self.mount_point
-                )
-            )
-            active_key_id = active_key_data["data"]["data"]["active_key_id"]
-
-            key_data = self.vault_client.client.secrets.kv.v2.read_secret_version(
-                path=f"{self.key_prefix}{active_key_id}", mount_point=self.mount_point
-            )
-
-            return {
-                "private_key": base64.b64decode(
-                    key_data["data"]["data"]["private_key"]
-                ),
-                "public_key": base64.b64decode(key_data["data"]["data"]["public_key"]),
-            }
+            return self._read_key_pair(self.get_active_key_id())
         except Exception as e:
             logger.error("get_active_keys_failed", error=str(e))
             raise
 
+    def get_signing_keys(self) -> dict[str, any]:
+        """
+        Get the parsed active key pair, reloading it from Vault only when the
+        active key id has changed. The active key id itself is re-checked at
+        most once every ``key_check_interval`` seconds.
+        """
+        now = time.monotonic()
+        cached = self._signing_keys
+
+        if cached and now - self._signing_keys_checked_at < self.key_check_interval:
+            SIGNING_KEY_CACHE.labels(result="hit").inc()
+            return cached
+
+        with self._signing_keys_lock:
+            cached = self._signing_keys
+            if cached and now - self._signing_keys_checked_at < self.key_check_interval:
+                SIGNING_KEY_CACHE.labels(result="hit").inc()
+                return cached
+
+            try:
+                active_key_id = self.get_active_key_id()
+
+                if cached and cached["key_id"] == active_key_id:
+                    self._signing_keys_checked_at = now
+                    SIGNING_KEY_CACHE.labels(result="hit").inc()
+                    return cached
+
+                key_pair = self._read_key_pair(active_key_id)
+                signing_keys = {
+                    "key_id": active_key_id,
+                    "algorithm": key_pair["algorithm"],
+                    "private_key": serialization.load_pem_private_key(
+                        key_pair["private_key"], password=None
+                    ),  # TODO: Add password
+                    "private_pem": key_pair["private_key"],
+                    "public_key": serialization.load_pem_public_key(
+                        key_pair["public_key"]
+                    ),
+                }
+            except Exception as e:
+                logger.error("get_signing_keys_failed", error=str(e))
+                raise
+
+            self._signing_keys = signing_keys
+            self._signing_keys_checked_at = now
+            SIGNING_KEY_CACHE.labels(result="reload").inc()
+
+            logger.info(
+                "signing_keys_reloaded",
+                key_id=active_key_id,
+                algorithm=signing_keys["algorithm"],
+            )
+            return signing_keys
+
+    def invalidate_signing_keys(self) -> None:
+        """Drop the cached signing keys so the next lookup reloads them"""
+        with self._signing_keys_lock:
+            self._signing_keys = None
+            self._signing_keys_checked_at = 0.0
+
+    def needs_algorithm_rotation(self) -> bool:
+        """Check whether the active key pair uses another algorithm than configured"""
+        return self.get_signing_keys()["algorithm"] != self.algorithm
+
     def initialize_if_needed(self):
         # noinspection PyBroadException
         try:
@@ -1,4 +1,4 @@
-import redis
+import redis.asyncio as redis
 import structlog
 from datetime import datetime, timedelta, timezone
 
@@ -17,7 +17,7 @@ class KeyRotationManager:
 
     async def check_and_rotate_keys(self) -> None:
         """Check if keys need to be rotated and rotate them if necessary."""
-        lock_acquired = self.redis.set(
+        lock_acquired = await self.redis.set(
             self.rotation_lock_key,
             "1",
             ex=300,  # TODO: Move to settings
@@ -28,8 +28,8 @@ class KeyRotationManager:
             return
 
         try:
-            last_rotation = self.redis.get(self.last_rotation_key)
-            if last_rotation:
+            last_rotation = await self.redis.get(self.last_rotation_key)
+            if last_rotation and not self.key_manager.needs_algorithm_rotation():
                 last_rotation_time = datetime.fromisoformat(last_rotation.decode())
                 if (
                     datetime.now(timezone.utc) - last_rotation_time
@@ -39,11 +39,11 @@ class KeyRotationManager:
 
             self.key_manager.rotate_keys()
 
-            self.redis.set(
+            await self.redis.set(
                 self.last_rotation_key,
                 datetime.now(timezone.utc).isoformat(),
             )
 
             logger.info("key_rotation_check_complete")
         finally:
-            self.redis.delete(self.rotation_lock_key)
+            await self.redis.delete(self.rotation_lock_key)
@@ -0,0 +1,62 @@
+import uuid
+
+import redis.asyncio as redis
+import structlog
+
+logger = structlog.get_logger()
+
+RENEW_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderLease:
+    """
+    Redis lease that elects a single leader among all workers. The holder
+    has to renew it before ``ttl`` seconds pass, otherwise any other worker
+    may take it over.
+    """
+
+    def __init__(self, redis_client: redis.Redis, name: str, ttl: int) -> None:
+        self.redis = redis_client
+        self.key = f"leader_lease:{name}"
+        self.token = uuid.uuid4().hex
+        self.ttl_ms = ttl * 1000
+        self.is_leader = False
+        self._renew = self.redis.register_script(RENEW_LEASE_SCRIPT)
+        self._release = self.redis.register_script(RELEASE_LEASE_SCRIPT)
+        self.logger = logger.bind(component="leader_lease", lease=self.key)
+
+    async def acquire_or_renew(self) -> bool:
+        """Renew the lease if we hold it, otherwise try to take it over"""
+        if self.is_leader:
+            if await self._renew(keys=[self.key], args=[self.token, self.ttl_ms]):
+                return True
+
+            self.is_leader = False
+            self.logger.warning("leader_lease_lost")
+
+        if await self.redis.set(self.key, self.token, px=self.ttl_ms, nx=True):
+            self.is_leader = True
+            self.logger.info("leader_lease_acquired")
+
+        return self.is_leader
+
+    async def release(self) -> None:
+        """Give up the lease so another worker can take over immediately"""
+        if not self.is_leader:
+            return
+
+        self.is_leader = False
+        await self._release(keys=[self.key], args=[self.token])
+        self.logger.info("leader_lease_released")
@@ -1,28 +1,60 @@
-import redis
+import asyncio
+import redis.asyncio as redis
+from fastapi import Request
 
 from app.core.config import get_settings
 from app.core.logging_config import configure_logger
+from app.monitoring.metrics import REDIS_UP
 
 logger = configure_logger()
 settings = get_settings()
-redis_pool = redis.ConnectionPool(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    max_connections=settings.REDIS_MAX_CONNECTIONS,
-    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
-)
-
-
-def get_redis() -> redis.Redis:
-    redis_client = redis.Redis(connection_pool=redis_pool)
-
-    try:
-        redis_client.ping()
-        return redis_client
-    except redis.exceptions.ConnectionError as e:
-        logger.error(
-            "redis_connection_failed",
-            status="failed",
-            error=str(e),
-        )
-        raise e
+
+
+def create_redis_client() -> redis.Redis:
+    """Create the app-scoped async Redis client and its connection pool."""
+    redis_pool = redis.BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        timeout=settings.REDIS_SOCKET_TIMEOUT,
+    )
+    return redis.Redis(connection_pool=redis_pool)
+
+
+async def get_redis(request: Request) -> redis.Redis:
+    """Dependency returning the Redis client created in the app lifespan."""
+    return request.app.state.redis
+
+
+class RedisHealthMonitor:
+    def __init__(self, redis_client: redis.Redis) -> None:
+        self.redis = redis_client
+        self.interval = settings.HEALTH_CHECK_INTERVAL
+        self.healthy = True
+
+    async def check(self) -> bool:
+        """Ping Redis once and record the result"""
+        try:
+            await self.redis.ping()
+            healthy = True
+        except redis.RedisError as e:
+            logger.error(
+                "redis_connection_failed",
+                status="failed",
+                error=str(e),
+            )
+            healthy = False
+
+        if healthy and not self.healthy:
+            logger.info("redis_connection_restored", status="success")
+
+        self.healthy = healthy
+        REDIS_UP.set(1 if healthy else 0)
+        return healthy
+
+    async def run(self) -> None:
+        """Health-check Redis in the background instead of on every request"""
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
@@ -1,23 +1,51 @@
+import asyncio
 import hashlib
 import hvac
 import jwt
+import structlog
+import threading
+import time
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
 from functools import lru_cache
 from typing import Optional
 
 from app.core.config import get_settings
+from app.monitoring.metrics import (
+    SECRET_CACHE,
+    SECRET_REFRESH_FAILURES,
+    VERIFIED_TOKEN_CACHE,
+)
 
 settings = get_settings()
+logger = structlog.get_logger()
 
 
 class VaultClient:
+    """
+    Thin wrapper around hvac that keeps secrets in memory.
+
+    A secret read through ``get_secret`` is cached for SECRET_CACHE_TTL
+    seconds, and ``refresh_secrets`` keeps every cached secret fresh in the
+    background, so requests do not wait on Vault. If Vault cannot be
+    reached, the last known value is served for up to SECRET_STALE_SECONDS
+    past its TTL, retrying Vault at most every SECRET_REFRESH_INTERVAL.
+    """
+
     def __init__(self) -> None:
         self.client = hvac.Client(
             url=settings.VAULT_ADDRESS,
             token=settings.VAULT_TOKEN,
         )
         self.mount_point = settings.VAULT_MOUNT_POINT
+        self.cache_ttl = settings.SECRET_CACHE_TTL
+        self.stale_seconds = settings.SECRET_STALE_SECONDS
+        self.refresh_interval = settings.SECRET_REFRESH_INTERVAL
+        self._secrets: dict[str, dict] = {}
+        self._secrets_lock = threading.Lock()
 
     def initialize(self):
         """Initialize Vault with required secrets if they do not exist."""
@@ -51,17 +79,86 @@ class VaultClient:
                     secret=dict(value=value),
                 )
 
+    def _read_secret(self, key: str) -> str:
+        secret = self.client.secrets.kv.v2.read_secret_version(
+            path=key,
+            mount_point=self.mount_point,
+        )
+        return secret["data"]["data"]["value"]
+
+    def _fetch_secret(self, key: str) -> str:
+        """Read a secret from Vault and cache it"""
+        attempted_at = time.monotonic()
+        try:
+            value = self._read_secret(key)
+        except Exception:
+            with self._secrets_lock:
+                if key in self._secrets:
+                    self._secrets[key]["checked_at"] = attempted_at
+            raise
+
+        with self._secrets_lock:
+            self._secrets[key] = {
+                "value": value,
+                "fetched_at": attempted_at,
+                "checked_at": attempted_at,
+            }
+        return value
+
     def get_secret(self, key: str) -> str:
-        """Retrieve a secret from Vault."""
+        """Retrieve a secret, from memory unless its cached value expired."""
+        if self.cache_ttl <= 0:
+            try:
+                return self._read_secret(key)
+            except Exception as e:
+                raise Exception(f"Failed to retrieve secret {key}: {str(e)}")
+
+        now = time.monotonic()
+        with self._secrets_lock:
+            cached = self._secrets.get(key)
+
+        if cached:
+            age = now - cached["fetched_at"]
+            if age < self.cache_ttl:
+                SECRET_CACHE.labels(result="hit").inc()
+                return cached["value"]
+
+            usable = age < self.cache_ttl + self.stale_seconds
+            if usable and now - cached["checked_at"] < self.refresh_interval:
+                SECRET_CACHE.labels(result="stale").inc()
+                return cached["value"]
+
         try:
-            secret = self.client.secrets.kv.v2.read_secret_version(
-                path=key,
-                mount_point=self.mount_point,
-            )
-            return secret["data"]["data"]["value"]
+            value = self._fetch_secret(key)
         except Exception as e:
+            if cached and usable:
+                SECRET_REFRESH_FAILURES.inc()
+                SECRET_CACHE.labels(result="stale").inc()
+                logger.warning("secret_served_stale", key=key, error=str(e))
+                return cached["value"]
             raise Exception(f"Failed to retrieve secret {key}: {str(e)}")
 
+        SECRET_CACHE.labels(result="miss").inc()
+        return value
+
+    def refresh_cached_secrets(self) -> None:
+        """Re-read every cached secret from Vault, keeping the old value on errors"""
+        with self._secrets_lock:
+            keys = list(self._secrets)
+
+        for key in keys:
+            try:
+                self._fetch_secret(key)
+            except Exception as e:
+                SECRET_REFRESH_FAILURES.inc()
+                logger.warning("secret_refresh_failed", key=key, error=str(e))
+
+    async def refresh_secrets(self) -> None:
+        """Refresh the cached secrets every SECRET_REFRESH_INTERVAL seconds"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await asyncio.to_thread(self.refresh_cached_secrets)
+
 
 @lru_cache()
 def get_vault_client() -> VaultClient:
@@ -70,6 +167,68 @@ def get_vault_client() -> VaultClient:
     return client
 
 
+class VerifiedTokenCache:
+    """
+    Per-worker LRU of the claims of tokens that passed verification, keyed
+    by a digest of the token, so a client presenting the same token for
+    every chunk is only verified once. Entries expire with the token, and
+    the whole cache is dropped as soon as the JWT secret changes.
+    """
+
+    def __init__(self, max_entries: int = settings.TOKEN_CACHE_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[bytes, dict] = OrderedDict()
+        self._secret_digest: Optional[bytes] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(value: str) -> bytes:
+        return hashlib.sha256(value.encode("utf-8")).digest()
+
+    def _check_secret(self, jwt_secret: str) -> None:
+        """Forget every entry verified with a previous secret"""
+        secret_digest = self._digest(jwt_secret)
+        if secret_digest != self._secret_digest:
+            self._entries.clear()
+            self._secret_digest = secret_digest
+
+    def get(self, token: str, jwt_secret: str) -> Optional[dict]:
+        if self.max_entries <= 0:
+            return None
+
+        key = self._digest(token)
+        with self._lock:
+            self._check_secret(jwt_secret)
+            payload = self._entries.get(key)
+            if payload is not None and payload["exp"] <= time.time():
+                del self._entries[key]
+                payload = None
+
+            if payload is None:
+                VERIFIED_TOKEN_CACHE.labels(result="miss").inc()
+                return None
+
+            self._entries.move_to_end(key)
+
+        VERIFIED_TOKEN_CACHE.labels(result="hit").inc()
+        return dict(payload)
+
+    def put(self, token: str, jwt_secret: str, payload: dict) -> None:
+        if self.max_entries <= 0 or not isinstance(payload.get("exp"), (int, float)):
+            return
+
+        key = self._digest(token)
+        with self._lock:
+            self._check_secret(jwt_secret)
+            self._entries[key] = dict(payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+verified_token_cache = VerifiedTokenCache()
+
+
 class TokenManager:
     def __init__(self, vault_client: VaultClient) -> None:
         self.vault_client = vault_client
@@ -78,6 +237,15 @@ class TokenManager:
         self, user_id: int, username: str, expires_delta: Optional[timedelta] = None
     ) -> str:
         """Create a JWT token for the given user_id."""
+        return self.issue_token(user_id, username, expires_delta)[0]
+
+    def issue_token(
+        self, user_id: int, username: str, expires_delta: Optional[timedelta] = None
+    ) -> tuple[str, dict]:
+        """
+        Create a JWT token for the given user_id and return it with its
+        claims, exactly as ``verify_token`` would decode them.
+        """
         jwt_secret = self.vault_client.get_secret("jwt_secret")
 
         if not expires_delta:
@@ -88,10 +256,12 @@ class TokenManager:
         to_encode = {
             "uid": user_id,
             "username": username,
-            "exp": expires,
+            # PyJWT encodes a datetime as whole seconds, do it up front
+            "exp": int(expires.timestamp()),
         }
 
-        return jwt.encode(to_encode, jwt_secret, algorithm=settings.JWT_ALGORITHM)
+        token = jwt.encode(to_encode, jwt_secret, algorithm=settings.JWT_ALGORITHM)
+        return token, to_encode
 
     @staticmethod
     def generate_ephemeral_key_from_jwt(token: str) -> bytes:
@@ -117,16 +287,36 @@ class TokenManager:
         except jwt.InvalidTokenError:
             raise ValueError("Invalid JWT.")
 
+    def derive_session_key(self, payload: dict) -> bytes:
+        """
+        Derive the AES key of a session from its verified claims with
+        HKDF-SHA256, keyed with the master symmetric key, so the key never
+        has to be stored.
+        """
+        master_key = self.vault_client.get_secret("master_sym_key")
+        uid = payload.get("uid", "0")
+        username = payload.get("username", "")
+        info = f"session:{uid}:{username}:{payload.get('exp', '0')}"
+
+        return HKDF(
+            algorithm=hashes.SHA256(), length=32, salt=None, info=info.encode()
+        ).derive(master_key.encode())
+
     def verify_token(self, token: str) -> dict:
         """Verify the JWT token and return the payload."""
         jwt_secret = self.vault_client.get_secret("jwt_secret")
 
+        payload = verified_token_cache.get(token, jwt_secret)
+        if payload is not None:
+            return payload
+
         try:
             payload = jwt.decode(
                 token, jwt_secret, algorithms=[settings.JWT_ALGORITHM]
             )
+            verified_token_cache.put(token, jwt_secret, payload)
             return payload
         except jwt.ExpiredSignatureError:
             raise Exception("Token has expired")
-        except jwt.JWTError:
+        except jwt.InvalidTokenError:
             raise Exception("Invalid token")
@@ -1,9 +1,12 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import get_settings
 
 settings = get_settings()
 
+# Sync engine, kept for Alembic and scripts
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args=(
@@ -12,3 +15,35 @@ engine = create_engine(
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Point a database URL at the asyncio driver of its backend"""
+    url = make_url(database_url)
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    elif url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+
+# Async engine for the request path, so waiting on Postgres does not hold
+# a threadpool slot
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL),
+    **(
+        {}
+        if "sqlite" in settings.DATABASE_URL
+        else {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+        }
+    ),
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
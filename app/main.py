@@ -1,3 +1,4 @@
+import asyncio
 import time
 import uuid
 from contextlib import asynccontextmanager
@@ -8,18 +9,22 @@ from starlette.responses import JSONResponse
 
 from app.api.v1.endpoints.auth import router as auth_router
 from app.api.v1.endpoints.script import router as script_router
+from app.api.v1.endpoints.script import start_chunk_refresher
 from app.api.v1.endpoints.telemetry import router as telemetry_router
 from app.middleware.rate_limit import rate_limit_middleware
 from app.middleware.validation import validation_middleware
 from app.monitoring.health import router as health_router
 from app.monitoring.metrics import metrics_middleware
 from app.core.config import get_settings
+from app.core.crypto_executor import crypto_executor
 from app.core.logging_config import configure_logger
-from app.core.redis_config import get_redis
+from app.core.redis_config import RedisHealthMonitor, create_redis_client
 from app.core.secrets import get_vault_client
 from app.core.key_management import KeyManager
 from app.core.key_rotation_manager import KeyRotationManager
-from app.database import engine
+from app.services.script_registry import script_registry
+from app.services.user_cache import authorized_user_cache
+from app.database import async_engine, engine
 
 logger = configure_logger()
 settings = get_settings()
@@ -33,11 +38,33 @@ async def lifespan(arg_app: FastAPI) -> any:
         key_manager = KeyManager(vault_client)
         key_manager.initialize_if_needed()
 
-        redis_client = get_redis()
+        redis_client = create_redis_client()
+        await redis_client.ping()
+        arg_app.state.redis = redis_client
+        authorized_user_cache.bind(redis_client)
 
         key_rotation_manager = KeyRotationManager(redis_client, key_manager)
         await key_rotation_manager.check_and_rotate_keys()
 
+        redis_monitor = RedisHealthMonitor(redis_client)
+        arg_app.state.redis_monitor = redis_monitor
+        arg_app.state.background_tasks = [
+            asyncio.create_task(redis_monitor.run()),
+            await start_chunk_refresher(redis_client),
+            asyncio.create_task(authorized_user_cache.listen()),
+        ]
+        if settings.SECRET_CACHE_TTL > 0:
+            await asyncio.to_thread(vault_client.get_secret, "jwt_secret")
+            arg_app.state.background_tasks.append(
+                asyncio.create_task(vault_client.refresh_secrets())
+            )
+        if settings.SCRIPT_WATCH_INTERVAL > 0:
+            arg_app.state.background_tasks.append(
+                asyncio.create_task(
+                    script_registry.watch(redis_client, settings.SCRIPT_WATCH_INTERVAL)
+                )
+            )
+
         engine.dispose()
         engine.pool.dispose()
 
@@ -58,9 +85,17 @@ async def lifespan(arg_app: FastAPI) -> any:
         raise e
     yield
     try:
+        for task in arg_app.state.background_tasks:
+            task.cancel()
+        await asyncio.gather(*arg_app.state.background_tasks, return_exceptions=True)
+
+        crypto_executor.shutdown()
+        script_registry.shutdown()
+
         engine.dispose()
+        await async_engine.dispose()
 
-        redis_client.close()
+        await redis_client.aclose()
 
         logger.info("application_shutdown_complete", status="success")
     except Exception as e:
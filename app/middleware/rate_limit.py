@@ -1,10 +1,9 @@
-import redis
+import redis.asyncio as redis
 import time
-from fastapi import Depends, Request, HTTPException
+from fastapi import Request, HTTPException
 
 from app.core.config import get_settings
 from app.core.logging_config import configure_logger
-from app.core.redis_config import get_redis
 
 logger = configure_logger()
 settings = get_settings()
@@ -43,7 +42,7 @@ class RateLimiter:
         pipeline.incr(key)
         pipeline.expire(key, self.window)
 
-        result = pipeline.execute()
+        result = await pipeline.execute()
         request_count = result[0]
 
         if request_count > self.rate_limit:
@@ -68,7 +67,7 @@ async def rate_limit_middleware(request: Request, call_next: any) -> any:
         if request.url.path == "monitoring/health":
             return await call_next(request)
 
-        rate_limiter = RateLimiter(get_redis())
+        rate_limiter = RateLimiter(request.app.state.redis)
         await rate_limiter.is_rate_limited(request)
 
         response = await call_next(request)
@@ -1,12 +1,14 @@
 import jwt
-import redis
+import redis.asyncio as redis
 import structlog
 import time
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from app.database import SessionLocal
+from app.database import AsyncSessionLocal
 from app.core.config import get_settings
 from app.core.redis_config import get_redis
 from app.core.secrets import get_vault_client
@@ -18,16 +20,13 @@ settings = get_settings()
 router = APIRouter()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 class HealthChecker:
-    def __init__(self, db: Session, redis_client: redis.Redis, vault_client: any):
+    def __init__(self, db: AsyncSession, redis_client: redis.Redis, vault_client: any):
         self.db = db
         self.redis = redis_client
         self.vault_client = vault_client
@@ -38,7 +37,7 @@ class HealthChecker:
         """Check database connectivity and basic operations"""
         try:
             start_time = time.time()
-            self.db.query(AuthorizedUser).first()
+            await self.db.execute(select(AuthorizedUser).limit(1))
             end_time = time.time()
             latency_ms = (end_time - start_time) * 1000
             return {"status": "healthy", "latency_ms": latency_ms}
@@ -49,7 +48,7 @@ class HealthChecker:
         """Check Redis connectivity and operations"""
         try:
             start_time = time.time()
-            self.redis.ping()
+            await self.redis.ping()
             end_time = time.time()
             latency_ms = (end_time - start_time) * 1000
             return {"status": "healthy", "latency_ms": latency_ms}
@@ -59,7 +58,10 @@ class HealthChecker:
     async def check_vault(self) -> dict[str, any]:
         """Check Vault connectivity and seal status"""
         try:
-            seal_status = self.vault_client.client.sys.read_seal_status()
+            # hvac is blocking, keep it off the event loop
+            seal_status = await run_in_threadpool(
+                self.vault_client.client.sys.read_seal_status
+            )
             return {
                 "status": "healthy" if not seal_status["sealed"] else "sealed",
                 "sealed": seal_status["sealed"],
@@ -68,7 +70,7 @@ class HealthChecker:
             logger.error("vault_health_check_failed", error=str(e))
             return {"status": "unhealthy", "error": str(e)}
 
-    def record_failed_auth(self, ip_address: str) -> None:
+    async def record_failed_auth(self, ip_address: str) -> None:
         """Record failed authentication attempts"""
         pipeline = self.redis.pipeline()
         key = f"{self.failed_auth_key}{ip_address}"
@@ -76,7 +78,7 @@ class HealthChecker:
         pipeline.incr(key)
         pipeline.expire(key, 3600)  # TODO: Move to settings
 
-        current_count = int(self.redis.get(key) or 0)
+        current_count = int(await self.redis.get(key) or 0)
 
         if current_count >= 5:
             pipeline.sadd(self.sussy_baka_ips_key, ip_address)
@@ -86,19 +88,19 @@ class HealthChecker:
                 failed_attempts=current_count,
             )
 
-        pipeline.execute()
+        await pipeline.execute()
 
-    def check_suspicious_activity(self, ip_address: str) -> bool:
+    async def check_suspicious_activity(self, ip_address: str) -> bool:
         """Check if an IP address is suspicious"""
-        return bool(self.redis.sismember(self.sussy_baka_ips_key, ip_address))
+        return bool(await self.redis.sismember(self.sussy_baka_ips_key, ip_address))
 
 
 @router.get("/health")
 async def health_check(
-    db: Session = Depends(get_db), r: redis.Redis = Depends(get_redis)
+    db: AsyncSession = Depends(get_db), r: redis.Redis = Depends(get_redis)
 ):
     """Comprehensive health check endpoint"""
-    vault_client = get_vault_client()
+    vault_client = await run_in_threadpool(get_vault_client)
     checker = HealthChecker(db, r, vault_client)
 
     db_health = await checker.check_database()
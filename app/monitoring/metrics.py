@@ -1,5 +1,5 @@
 import time
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 from fastapi import Request
 
 
@@ -21,6 +21,75 @@ KEY_ROTATIONS = Counter(
     "key_rotations_total", "Total number of key rotations", ["status"]
 )
 
+SECRET_CACHE = Counter(
+    "secret_cache_total",
+    "Vault secret lookups served fresh from memory, stale from memory or from Vault",
+    ["result"],
+)
+
+SECRET_REFRESH_FAILURES = Counter(
+    "secret_refresh_failures_total", "Failed attempts to re-read a cached secret"
+)
+
+VERIFIED_TOKEN_CACHE = Counter(
+    "verified_token_cache_total",
+    "Token verifications answered from the verified-token cache versus decoded",
+    ["result"],
+)
+
+AUTHORIZED_USER_CACHE = Counter(
+    "authorized_user_cache_total",
+    "Authorized user lookups by the tier that answered: memory, redis or database",
+    ["result"],
+)
+
+REDIS_UP = Gauge("redis_up", "Whether the last background Redis ping succeeded")
+
+SIGNING_KEY_CACHE = Counter(
+    "signing_key_cache_total",
+    "Signing key lookups served from memory versus reloaded from Vault",
+    ["result"],
+)
+
+CHUNK_CACHE = Counter(
+    "chunk_cache_total",
+    "Chunk window lookups served from worker memory versus loaded from Redis",
+    ["result"],
+)
+
+CHUNK_REFRESHER_LEADER = Gauge(
+    "chunk_refresher_leader", "Whether this worker currently publishes chunk windows"
+)
+
+CHUNK_SIZE_BYTES = Histogram(
+    "chunk_size_bytes",
+    "Size of generated script chunks",
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 65536),
+)
+
+CRYPTO_QUEUE_DEPTH = Gauge(
+    "crypto_executor_queue_depth", "Crypto tasks queued or running on this worker"
+)
+
+CRYPTO_WAIT_SECONDS = Histogram(
+    "crypto_executor_wait_seconds", "Time crypto tasks spend queued before running"
+)
+
+CRYPTO_SERVICE_SECONDS = Histogram(
+    "crypto_executor_service_seconds", "Time crypto tasks spend running"
+)
+
+CRYPTO_REJECTIONS = Counter(
+    "crypto_executor_rejections_total",
+    "Requests rejected with 503 because the crypto executor was full",
+)
+
+SESSION_RESPONSE_CACHE = Counter(
+    "session_response_cache_total",
+    "Chunk requests answered from a session's cached response versus sealed anew",
+    ["result"],
+)
+
 
 async def metrics_middleware(request: Request, call_next: any) -> any:
     start_time = time.time()
@@ -0,0 +1,312 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import redis.asyncio as redis
+import structlog
+
+from app.core.config import get_settings
+from app.monitoring.metrics import CHUNK_SIZE_BYTES
+from app.utils.chunking_utils import (
+    chunk_spans,
+    chunk_statistics,
+    hash_chunk,
+    rechunk_lua_source,
+    render_chunks,
+)
+from app.utils.compression_utils import check_codec, compress_chunk
+from app.utils.lua_transform import transform_lua
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+SCRIPT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class ScriptNotFound(Exception):
+    def __init__(self, script_id: str) -> None:
+        super().__init__(f"Script {script_id} not found")
+        self.script_id = script_id
+
+
+class ScriptRegistry:
+    """
+    Catalog of the Lua scripts in ``scripts_dir``, addressed by file stem.
+
+    Sources are only read when a script is first needed. Unless disabled,
+    each source is minified, its locals renamed and its strings encoded in
+    a process pool before chunking, so requests never transform anything.
+    The resulting chunk sets are compressed once per load and kept, ready
+    to publish, in an LRU bounded by ``max_loaded`` entries; entries idle
+    for longer than ``idle_seconds`` are dropped.
+
+    Each entry also keeps its own copy of the (transformed) source and its
+    chunk spans, so a reload after an edit only chunks and compresses the
+    edited region. Every worker therefore holds up to ``max_loaded``
+    sources in memory next to their chunks.
+    """
+
+    def __init__(
+        self,
+        scripts_dir: str = settings.SCRIPTS_DIR,
+        max_loaded: int = settings.SCRIPT_CACHE_MAX_ENTRIES,
+        idle_seconds: int = settings.SCRIPT_IDLE_SECONDS,
+        chunk_target_bytes: int = settings.CHUNK_TARGET_BYTES,
+        compression: str = settings.CHUNK_COMPRESSION,
+        compression_level: int = settings.CHUNK_COMPRESSION_LEVEL,
+        transform: bool = settings.SCRIPT_TRANSFORM,
+        transform_workers: int = settings.SCRIPT_TRANSFORM_WORKERS,
+    ) -> None:
+        check_codec(compression)
+
+        self.scripts_dir = scripts_dir
+        self.max_loaded = max_loaded
+        self.idle_seconds = idle_seconds
+        self.chunk_target_bytes = chunk_target_bytes
+        self.compression = compression
+        self.compression_level = compression_level
+        self.transform = transform
+        self.transform_workers = transform_workers
+        self._transform_pool: Optional[ProcessPoolExecutor] = None
+        self._loaded: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def script_path(self, script_id: str) -> str:
+        """Return the source path of a script, rejecting unknown ids"""
+        if not SCRIPT_ID_PATTERN.match(script_id):
+            raise ScriptNotFound(script_id)
+
+        path = os.path.join(self.scripts_dir, f"{script_id}.lua")
+        if not os.path.isfile(path):
+            raise ScriptNotFound(script_id)
+
+        return path
+
+    def exists(self, script_id: str) -> bool:
+        """Check whether a script is part of the catalog"""
+        try:
+            self.script_path(script_id)
+            return True
+        except ScriptNotFound:
+            return False
+
+    def list_scripts(self) -> list[str]:
+        """Return the ids of every script in the catalog"""
+        return sorted(
+            file_name[: -len(".lua")]
+            for file_name in os.listdir(self.scripts_dir)
+            if file_name.endswith(".lua")
+            and SCRIPT_ID_PATTERN.match(file_name[: -len(".lua")])
+        )
+
+    def _transform_source(self, source: bytes) -> bytes:
+        """Run the Lua transformation, in the process pool if one is configured"""
+        arguments = (
+            source,
+            settings.SCRIPT_RENAME_LOCALS,
+            settings.SCRIPT_ENCODE_STRINGS,
+            settings.SCRIPT_RENAME_SALT,
+        )
+        if self.transform_workers <= 0:
+            return transform_lua(*arguments)
+
+        with self._lock:
+            if self._transform_pool is None:
+                self._transform_pool = ProcessPoolExecutor(
+                    max_workers=self.transform_workers
+                )
+            pool = self._transform_pool
+
+        return pool.submit(transform_lua, *arguments).result()
+
+    def _file_stat(self, script_id: str) -> tuple[int, int]:
+        stat = os.stat(self.script_path(script_id))
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, script_id: str, previous: Optional[dict] = None) -> dict:
+        """
+        Read a script source, transform it, chunk it and compress it.
+        Given the previously loaded entry, only the edited region is chunked
+        again and unchanged chunks keep their payloads.
+        """
+        path = self.script_path(script_id)
+
+        with open(path, "rb") as source_file:
+            stat = os.fstat(source_file.fileno())
+            source = source_file.read()
+
+        if source and self.transform:
+            source = self._transform_source(source)
+
+        if not source:
+            spans = []
+        elif previous is not None:
+            spans = rechunk_lua_source(
+                previous["source"], previous["spans"], source, self.chunk_target_bytes
+            )
+        else:
+            spans = chunk_spans(source, self.chunk_target_bytes)
+        chunks = render_chunks(source, spans)
+
+        reused = {}
+        if previous is not None:
+            reused = dict(zip(previous["hashes"], previous["chunks"]))
+
+        payloads = []
+        hashes = []
+        for chunk in chunks:
+            chunk_bytes = chunk.encode("utf-8")
+            CHUNK_SIZE_BYTES.observe(len(chunk_bytes))
+            digest = hash_chunk(chunk_bytes)
+            payload = reused.get(digest)
+            if payload is None:
+                payload = compress_chunk(
+                    chunk_bytes, self.compression, self.compression_level
+                )
+            payloads.append(payload)
+            hashes.append(digest)
+
+        logger.info(
+            "script_reloaded" if previous is not None else "script_loaded",
+            script_id=script_id,
+            compression=self.compression,
+            compressed_bytes=sum(len(payload) for payload in payloads),
+            reused_chunks=sum(digest in reused for digest in hashes),
+            **chunk_statistics(chunks),
+        )
+        return {
+            "chunks": payloads,
+            "hashes": hashes,
+            "source": source,
+            "spans": spans,
+            "stat": (stat.st_mtime_ns, stat.st_size),
+            "last_used": time.monotonic(),
+        }
+
+    def _evict_idle(self, now: float) -> None:
+        """Drop loaded scripts that exceed the LRU size or have gone idle"""
+        while len(self._loaded) > self.max_loaded:
+            script_id, _ = self._loaded.popitem(last=False)
+            logger.info("script_evicted", script_id=script_id, reason="lru")
+
+        for script_id, entry in list(self._loaded.items()):
+            if now - entry["last_used"] > self.idle_seconds:
+                del self._loaded[script_id]
+                logger.info("script_evicted", script_id=script_id, reason="idle")
+
+    def get_chunks(self, script_id: str) -> list[bytes]:
+        """Return the publishable chunk payloads of a script, loading it on first use"""
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._loaded.get(script_id)
+            if entry:
+                entry["last_used"] = now
+                self._loaded.move_to_end(script_id)
+                return entry["chunks"]
+
+        entry = self._load(script_id)
+
+        with self._lock:
+            self._loaded[script_id] = entry
+            self._loaded.move_to_end(script_id)
+            self._evict_idle(now)
+
+        return entry["chunks"]
+
+    def loaded_scripts(self) -> list[str]:
+        with self._lock:
+            return list(self._loaded)
+
+    def reload(self, script_id: str, force: bool = False) -> bool:
+        """
+        Re-read a loaded script if its file changed on disk (or if forced),
+        re-chunking only the edited region. Returns whether its chunks
+        changed. Scripts that are not loaded are read fresh on first use.
+        """
+        with self._lock:
+            previous = self._loaded.get(script_id)
+        if previous is None:
+            return False
+
+        try:
+            if not force and self._file_stat(script_id) == previous["stat"]:
+                return False
+            entry = self._load(script_id, previous)
+        except (ScriptNotFound, FileNotFoundError):
+            self.evict(script_id)
+            logger.info("script_evicted", script_id=script_id, reason="removed")
+            return True
+
+        with self._lock:
+            if script_id not in self._loaded:
+                return False
+            entry["last_used"] = self._loaded[script_id]["last_used"]
+            self._loaded[script_id] = entry
+
+        return entry["hashes"] != previous["hashes"]
+
+    async def watch(self, redis_client: redis.Redis, interval: int) -> None:
+        """
+        Reload loaded scripts whose file changed, every ``interval`` seconds.
+        A bump of a script's generation counter in Redis (see
+        ``request_reload``) forces a reload in every worker, for deployments
+        where the file's modification time cannot be relied on.
+        """
+        generations: dict[str, int] = {}
+
+        while True:
+            try:
+                script_ids = self.loaded_scripts()
+                values = (
+                    await redis_client.mget(
+                        [script_generation_key(s) for s in script_ids]
+                    )
+                    if script_ids
+                    else []
+                )
+                # Scripts loaded since the last tick were just read from disk,
+                # only a later bump of their generation forces a reload
+                for script_id in set(generations) - set(script_ids):
+                    del generations[script_id]
+
+                for script_id, value in zip(script_ids, values):
+                    generation = int(value or 0)
+                    forced = generations.setdefault(script_id, generation) != generation
+                    generations[script_id] = generation
+
+                    if await asyncio.to_thread(self.reload, script_id, forced):
+                        logger.info(
+                            "script_changed", script_id=script_id, forced=forced
+                        )
+            except Exception as e:
+                logger.error("script_watch_failed", error=str(e))
+            await asyncio.sleep(interval)
+
+    def evict(self, script_id: str) -> None:
+        """Forget the loaded chunks of a script"""
+        with self._lock:
+            self._loaded.pop(script_id, None)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._transform_pool is not None:
+                self._transform_pool.shutdown(wait=False, cancel_futures=True)
+                self._transform_pool = None
+
+
+def script_generation_key(script_id: str) -> str:
+    return f"script_generation:{script_id}"
+
+
+async def request_reload(redis_client: redis.Redis, script_id: str) -> int:
+    """Ask every worker to reload a script on its next watch tick"""
+    return await redis_client.incr(script_generation_key(script_id))
+
+
+script_registry = ScriptRegistry()
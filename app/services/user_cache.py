@@ -0,0 +1,294 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, Optional
+
+import redis.asyncio as redis
+import structlog
+from redis import Redis as SyncRedis
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import (
+    ORMExecuteState,
+    Session,
+    SessionTransaction,
+    object_session,
+)
+
+from app.core.config import get_settings
+from app.models.auth import AuthorizedUser
+from app.monitoring.metrics import AUTHORIZED_USER_CACHE
+
+logger = structlog.get_logger()
+settings = get_settings()
+
+INVALIDATION_CHANNEL = "authorized_user_invalidations"
+ALL_USERS = "*"
+
+# Session.info key of the user ids written in the session's transaction
+_PENDING_INVALIDATIONS = "authorized_user_invalidations"
+
+
+def authorized_user_key(user_id: int) -> str:
+    return f"authorized_user:{user_id}"
+
+
+class AuthorizedUserCache:
+    """
+    Read-through cache of the username of every authorized user id, in
+    worker memory first and Redis second, so a burst of logins after a
+    deploy reaches Postgres at most once per user id and worker. Unknown
+    ids are cached as well, for the shorter ``negative_ttl``.
+
+    Committed ORM writes to ``authorized_users`` delete the users from Redis
+    and are broadcast on ``INVALIDATION_CHANNEL`` to the memory of every
+    worker. Memory entries live at most ``memory_ttl`` seconds, which bounds
+    how long a worker that missed a broadcast serves a stale user. Rows
+    changed outside the ORM are picked up once their entries expire, or
+    right away after ``invalidate_all``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.USER_CACHE_MAX_ENTRIES,
+        ttl: int = settings.USER_CACHE_TTL,
+        negative_ttl: int = settings.USER_CACHE_NEGATIVE_TTL,
+        memory_ttl: int = settings.USER_CACHE_MEMORY_TTL,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory_ttl = memory_ttl
+        self._entries: OrderedDict[int, tuple[Optional[str], float]] = OrderedDict()
+        self._loads: dict[int, asyncio.Future] = {}
+        self._generation = 0
+        self._tasks: set[asyncio.Task] = set()
+        self._redis: Optional[redis.Redis] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, redis_client: redis.Redis) -> None:
+        """Use the app's Redis client and event loop, called in the lifespan"""
+        self._redis = redis_client
+        self._loop = asyncio.get_running_loop()
+
+    def _ttl_for(self, username: Optional[str]) -> int:
+        return self.ttl if username is not None else self.negative_ttl
+
+    def _remember(self, user_id: int, username: Optional[str]) -> None:
+        ttl = min(self.memory_ttl, self._ttl_for(username))
+        self._entries[user_id] = (username, time.monotonic() + ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _forget(self, user_ids: Iterable) -> None:
+        """Drop users from this worker's memory, ``ALL_USERS`` drops everyone"""
+        user_ids = list(user_ids)
+        self._generation += 1
+        if ALL_USERS in user_ids:
+            self._entries.clear()
+            self._loads.clear()
+            return
+
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+            self._loads.pop(user_id, None)
+
+    async def _read_redis(self, user_id: int) -> tuple[bool, Optional[str]]:
+        try:
+            cached = await self._redis.get(authorized_user_key(user_id))
+        except Exception as e:
+            logger.warning("authorized_user_cache_unavailable", error=str(e))
+            return False, None
+
+        if cached is None:
+            return False, None
+        return True, json.loads(cached)["username"]
+
+    async def _write_redis(self, user_id: int, username: Optional[str]) -> None:
+        try:
+            await self._redis.set(
+                authorized_user_key(user_id),
+                json.dumps({"username": username}),
+                ex=self._ttl_for(username),
+            )
+        except Exception as e:
+            logger.warning("authorized_user_cache_unavailable", error=str(e))
+
+    async def _load(
+        self, user_id: int, load_username: Callable[[], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        generation = self._generation
+
+        found, username = await self._read_redis(user_id)
+        if found:
+            AUTHORIZED_USER_CACHE.labels(result="redis").inc()
+        else:
+            AUTHORIZED_USER_CACHE.labels(result="database").inc()
+            username = await load_username()
+            # Do not cache what an invalidation made stale in the meantime
+            if generation == self._generation:
+                await self._write_redis(user_id, username)
+
+        if generation == self._generation:
+            self._remember(user_id, username)
+        return username
+
+    async def get_username(
+        self, user_id: int, load_username: Callable[[], Awaitable[Optional[str]]]
+    ) -> Optional[str]:
+        """
+        Return the username of an authorized user id, or None if the id is
+        not authorized. ``load_username`` reads it from the database and
+        is only called on a miss in both tiers, once for concurrent callers.
+        """
+        if self.max_entries <= 0 or self._redis is None:
+            return await load_username()
+
+        cached = self._entries.get(user_id)
+        if cached is not None and cached[1] > time.monotonic():
+            self._entries.move_to_end(user_id)
+            AUTHORIZED_USER_CACHE.labels(result="memory").inc()
+            return cached[0]
+
+        pending = self._loads.get(user_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        load = asyncio.ensure_future(self._load(user_id, load_username))
+        self._loads[user_id] = load
+        try:
+            return await asyncio.shield(load)
+        finally:
+            if self._loads.get(user_id) is load:
+                del self._loads[user_id]
+
+    def invalidate(self, user_ids: Iterable) -> None:
+        """
+        Forget users in every worker and in Redis. Safe to call from any
+        thread; without a running bound loop (migrations, admin scripts) Redis
+        is updated with a short-lived synchronous client.
+        """
+        user_ids = list(user_ids)
+        loop = self._loop
+
+        if loop is None or loop.is_closed() or not loop.is_running():
+            self._forget(user_ids)
+            _broadcast_sync(user_ids)
+            return
+
+        def forget() -> None:
+            self._forget(user_ids)
+            task = loop.create_task(self._broadcast(user_ids))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        loop.call_soon_threadsafe(forget)
+
+    def invalidate_all(self) -> None:
+        """
+        Forget every user. Data migrations and scripts that write
+        ``authorized_users`` without the ORM call this once they are done.
+        """
+        self.invalidate([ALL_USERS])
+
+    async def _broadcast(self, user_ids: list) -> None:
+        try:
+            if ALL_USERS in user_ids:
+                async for key in self._redis.scan_iter(authorized_user_key("*")):
+                    await self._redis.delete(key)
+            else:
+                await self._redis.delete(*map(authorized_user_key, user_ids))
+            await self._redis.publish(INVALIDATION_CHANNEL, json.dumps(user_ids))
+        except Exception as e:
+            logger.warning("authorized_user_invalidation_failed", error=str(e))
+
+    async def listen(self) -> None:
+        """Apply the invalidations broadcast by any worker or script"""
+        while True:
+            try:
+                pubsub = self._redis.pubsub()
+                try:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    # Whatever was broadcast while not subscribed is lost
+                    self._forget([ALL_USERS])
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message is not None:
+                            self._forget(json.loads(message["data"]))
+                finally:
+                    await pubsub.aclose()
+            except Exception as e:
+                logger.warning("authorized_user_listener_failed", error=str(e))
+                await asyncio.sleep(1)
+
+
+def _broadcast_sync(user_ids: list) -> None:
+    """Delete users from Redis and broadcast it, outside the app's loop"""
+    client = SyncRedis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    )
+    try:
+        if ALL_USERS in user_ids:
+            keys = list(client.scan_iter(authorized_user_key("*")))
+        else:
+            keys = [authorized_user_key(user_id) for user_id in user_ids]
+        if keys:
+            client.delete(*keys)
+        client.publish(INVALIDATION_CHANNEL, json.dumps(user_ids))
+    except Exception as e:
+        logger.warning("authorized_user_invalidation_failed", error=str(e))
+    finally:
+        client.close()
+
+
+authorized_user_cache = AuthorizedUserCache()
+
+
+def _pending_invalidations(session: Session) -> set:
+    return session.info.setdefault(_PENDING_INVALIDATIONS, set())
+
+
+@event.listens_for(AuthorizedUser, "after_insert")
+@event.listens_for(AuthorizedUser, "after_update")
+@event.listens_for(AuthorizedUser, "after_delete")
+def _collect_authorized_user(mapper, connection, target: AuthorizedUser) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+
+    pending = _pending_invalidations(session)
+    pending.add(target.user_id)
+    # A changed primary key leaves the old id behind
+    pending.update(inspect(target).attrs.user_id.history.deleted or ())
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_writes(orm_execute_state: ORMExecuteState) -> None:
+    """Bulk insert, update or delete statements do not say which rows changed"""
+    if not (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        return
+
+    if any(m.class_ is AuthorizedUser for m in orm_execute_state.all_mappers):
+        _pending_invalidations(orm_execute_state.session).add(ALL_USERS)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    user_ids = session.info.pop(_PENDING_INVALIDATIONS, None)
+    if user_ids:
+        authorized_user_cache.invalidate(user_ids)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session: Session, previous: SessionTransaction) -> None:
+    if previous.parent is None:
+        session.info.pop(_PENDING_INVALIDATIONS, None)
@@ -0,0 +1,123 @@
+import asyncio
+import json
+from typing import Optional
+
+import redis.asyncio as redis
+
+from app.core.logging_config import configure_logger
+from app.monitoring.metrics import CHUNK_CACHE
+from app.utils.chunking_utils import (
+    chunk_blob_key,
+    current_window,
+    manifest_key,
+    metadata_key,
+)
+
+logger = configure_logger()
+
+
+class WindowChunkCache:
+    """
+    Per-worker cache of everything a script's time window needs to serve
+    chunks: the decoded metadata, the manifest and the raw chunk bodies.
+    Every user gets the same data within a window, so it is read from Redis
+    once per worker and dropped when the script's window rolls over, or
+    once it is older than the previous window for scripts nobody requests
+    anymore. Bodies are content-addressed, so those already cached for an
+    earlier window of the script are reused instead of being fetched again.
+    """
+
+    def __init__(self) -> None:
+        self._windows: dict[tuple[str, int], dict] = {}
+        self._locks: dict[tuple[str, int], asyncio.Lock] = {}
+
+    def _evict(self, script_id: str, time_window: int) -> None:
+        """
+        Drop every cached window of a script older than the given one, and
+        the windows of any script that are past the previous window
+        """
+        oldest = current_window() - 1
+        for cache in (self._windows, self._locks):
+            for key in [
+                k
+                for k in cache
+                if k[1] < oldest or (k[0] == script_id and k[1] < time_window)
+            ]:
+                del cache[key]
+
+    async def _load(
+        self, r: redis.Redis, script_id: str, time_window: int
+    ) -> Optional[dict]:
+        """Read a window's metadata, manifest and chunk bodies from Redis"""
+        metadata, manifest = await r.mget(
+            metadata_key(script_id, time_window), manifest_key(script_id, time_window)
+        )
+        if not metadata:
+            return None
+
+        metadata = json.loads(metadata)
+        known_bodies = self._known_bodies(script_id)
+        missing = sorted(
+            {
+                digest
+                for digest in metadata["chunks"].values()
+                if digest not in known_bodies
+            }
+        )
+
+        if missing:
+            fetched = await r.mget([chunk_blob_key(digest) for digest in missing])
+            if any(body is None for body in fetched):
+                logger.warning(
+                    "chunk_window_incomplete", script_id=script_id, window=time_window
+                )
+                return None
+            known_bodies.update(zip(missing, fetched))
+
+        return {
+            "metadata": metadata,
+            "manifest": json.loads(manifest) if manifest else None,
+            "chunks": {
+                idx: known_bodies[digest] for idx, digest in metadata["chunks"].items()
+            },
+        }
+
+    def _known_bodies(self, script_id: str) -> dict[str, bytes]:
+        """Map the chunk hashes of a script's cached windows to their bodies"""
+        return {
+            digest: window["chunks"][idx]
+            for (cached_script_id, _), window in self._windows.items()
+            if cached_script_id == script_id
+            for idx, digest in window["metadata"]["chunks"].items()
+        }
+
+    async def get_window(
+        self, r: redis.Redis, script_id: str, time_window: int
+    ) -> Optional[dict]:
+        """
+        Return the cached data of a script's window, loading it on first use.
+        Returns None if the window has not been published (yet).
+        """
+        key = (script_id, time_window)
+        window = self._windows.get(key)
+        if window:
+            CHUNK_CACHE.labels(result="hit").inc()
+            return window
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            window = self._windows.get(key)
+            if window:
+                CHUNK_CACHE.labels(result="hit").inc()
+                return window
+
+            CHUNK_CACHE.labels(result="miss").inc()
+            window = await self._load(r, script_id, time_window)
+            if window:
+                self._evict(script_id, time_window)
+                self._windows[key] = window
+
+            return window
+
+
+window_chunk_cache = WindowChunkCache()
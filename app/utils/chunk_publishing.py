@@ -0,0 +1,280 @@
+"""
+Publishing of chunk windows to Redis: the signed manifest, the chunk
+bodies and the refresher loop. Kept apart from ``chunking_utils`` because
+signing needs the key manager, and with it Vault, while chunking does not.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from random import shuffle
+from typing import Callable, Optional
+
+import redis.asyncio as redis
+
+from app.core.config import get_settings
+from app.core.leader_election import RELEASE_LEASE_SCRIPT, LeaderLease
+from app.core.logging_config import configure_logger
+from app.monitoring.metrics import CHUNK_REFRESHER_LEADER
+from app.utils.chunking_utils import (
+    chunk_blob_key,
+    current_window,
+    hash_chunk,
+    manifest_key,
+    metadata_key,
+    script_version,
+    script_version_key,
+)
+from app.utils.crypto_utils import sign_data_with_key
+
+settings = get_settings()
+logger = configure_logger()
+
+
+ACTIVE_SCRIPTS_KEY = "active_scripts"
+
+_script_activity: dict[str, float] = {}
+
+
+def canonical_manifest_bytes(
+    script_id: str, time_window: int, compression: str, chunk_hashes: dict
+) -> bytes:
+    """Serialize the signed part of a chunk manifest deterministically."""
+    return json.dumps(
+        {
+            "script": script_id,
+            "window": time_window,
+            "compression": compression,
+            "chunks": {str(idx): digest for idx, digest in chunk_hashes.items()},
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def build_chunk_manifest(
+    script_id: str, chunks: list[bytes], time_window: int
+) -> dict:
+    """
+    Build the manifest for a time window: the SHA-256 of every chunk payload
+    (as fed to AES-GCM, i.e. after compression), signed once so individual
+    chunk responses don't need a signature. The script version is derived
+    from the signed hashes and is not signed itself.
+    """
+    compression = settings.CHUNK_COMPRESSION
+    chunk_hashes = {str(idx): hash_chunk(chunk) for idx, chunk in enumerate(chunks)}
+    signature, key_id, algorithm = sign_data_with_key(
+        canonical_manifest_bytes(script_id, time_window, compression, chunk_hashes)
+    )
+
+    return {
+        "script": script_id,
+        "window": time_window,
+        "compression": compression,
+        "chunks": chunk_hashes,
+        "version": script_version(list(chunk_hashes.values())),
+        "key_id": key_id,
+        "algorithm": algorithm,
+        "signature": signature,
+    }
+
+
+async def update_chunks(
+    redis_client: redis.Redis, script_id: str, chunks: list[bytes], time_window: int
+) -> None:
+    """
+    Publish the given chunks for a time window.
+
+    Chunk bodies are content-addressed: a body that is already stored only
+    has its TTL extended, so an unchanged script costs one EXPIRE per chunk
+    instead of a rewrite. Missing bodies, the manifest and the window's
+    metadata (which maps chunk indices to hashes) are then written in one
+    MULTI/EXEC, so readers either see the complete new window or none of it.
+    Previous windows are left to expire through their TTL. The ordered
+    hashes are also kept per script version, for SCRIPT_VERSION_TTL_SECONDS,
+    so clients on an older version can be told which chunks changed.
+    """
+    # Signing may hit Vault, keep it off the event loop
+    manifest = await asyncio.to_thread(
+        build_chunk_manifest, script_id, chunks, time_window
+    )
+    chunk_hashes = manifest["chunks"]
+    bodies = {chunk_hashes[str(idx)]: chunk for idx, chunk in enumerate(chunks)}
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for digest in bodies:
+            pipe.expire(chunk_blob_key(digest), settings.chunk_ttl_seconds)
+        refreshed = await pipe.execute()
+
+    missing = [digest for digest, found in zip(bodies, refreshed) if not found]
+
+    chunk_metadata = {
+        "version": manifest["version"],
+        "compression": manifest["compression"],
+        "chunks": chunk_hashes,
+        "order": list(range(len(chunks))),
+    }
+    shuffle(chunk_metadata["order"])
+
+    async with redis_client.pipeline(transaction=True) as pipe:
+        for digest in missing:
+            pipe.set(
+                chunk_blob_key(digest), bodies[digest], ex=settings.chunk_ttl_seconds
+            )
+
+        pipe.set(
+            script_version_key(script_id, manifest["version"]),
+            json.dumps(list(chunk_hashes.values())),
+            ex=settings.SCRIPT_VERSION_TTL_SECONDS,
+        )
+        pipe.set(
+            manifest_key(script_id, time_window),
+            json.dumps(manifest),
+            ex=settings.chunk_ttl_seconds,
+        )
+        pipe.set(
+            metadata_key(script_id, time_window),
+            json.dumps(chunk_metadata),
+            ex=settings.chunk_ttl_seconds,
+        )
+        await pipe.execute()
+
+    logger.info(
+        f"Updated Redis with {len(chunks)} chunks of {script_id} "
+        f"for time window {time_window} ({len(missing)} new)"
+    )
+
+
+async def mark_script_active(redis_client: redis.Redis, script_id: str) -> None:
+    """
+    Record that a script is being served so the refresher keeps publishing
+    its windows. Each worker writes this at most once per window length.
+    """
+    now = time.time()
+    if now - _script_activity.get(script_id, 0) < settings.CHUNK_WINDOW_SECONDS:
+        return
+
+    _script_activity[script_id] = now
+    await redis_client.zadd(ACTIVE_SCRIPTS_KEY, {script_id: now})
+
+
+async def get_active_scripts(redis_client: redis.Redis) -> list[str]:
+    """Return the scripts requested within the last SCRIPT_IDLE_SECONDS"""
+    idle_since = time.time() - settings.SCRIPT_IDLE_SECONDS
+    await redis_client.zremrangebyscore(ACTIVE_SCRIPTS_KEY, "-inf", idle_since)
+    script_ids = await redis_client.zrange(ACTIVE_SCRIPTS_KEY, 0, -1)
+    return [script_id.decode() for script_id in script_ids]
+
+
+async def publish_window(
+    redis_client: redis.Redis,
+    script_id: str,
+    get_chunks: Callable[[str], list[bytes]],
+    time_window: int,
+) -> bool:
+    """
+    Publish a window of a script unless it already exists or another worker
+    is publishing it right now. A pre-staged future window is published
+    again if the script changed since, so a reloaded script goes live at
+    the next boundary; the current window is never rewritten under clients.
+    Returns whether this call published it.
+    """
+    metadata = await redis_client.get(metadata_key(script_id, time_window))
+    if metadata and time_window <= current_window():
+        return False
+
+    chunks = await asyncio.to_thread(get_chunks, script_id)
+    if not chunks:
+        return False
+    if metadata and json.loads(metadata).get("version") == script_version(
+        [hash_chunk(chunk) for chunk in chunks]
+    ):
+        return False
+
+    lock_key = f"chunk_publish_lock:{script_id}:{time_window}"
+    lock_token = uuid.uuid4().hex
+    if not await redis_client.set(lock_key, lock_token, ex=30, nx=True):
+        return False
+
+    try:
+        await update_chunks(redis_client, script_id, chunks, time_window)
+        return True
+    finally:
+        # The lock may have expired and been taken by another worker since
+        release_lock = redis_client.register_script(RELEASE_LEASE_SCRIPT)
+        await release_lock(keys=[lock_key], args=[lock_token])
+
+
+def windows_to_publish(now: Optional[float] = None) -> list[int]:
+    """
+    Return the windows that should exist in Redis at the given time: the
+    current one and, within CHUNK_PRESTAGE_SECONDS of the boundary, the next
+    one, so it is already in place when clients roll over to it.
+    """
+    if now is None:
+        now = time.time()
+
+    time_window = current_window(now)
+    windows = [time_window]
+
+    next_boundary = (time_window + 1) * settings.CHUNK_WINDOW_SECONDS
+    if next_boundary - now <= settings.CHUNK_PRESTAGE_SECONDS:
+        windows.append(time_window + 1)
+
+    return windows
+
+
+async def refresh_chunks(
+    redis_client: redis.Redis,
+    get_chunks: Callable[[str], list[bytes]],
+    interval: int,
+) -> None:
+    """
+    Keep the current time window of every active script published in Redis
+    and stage the next window before its boundary. Every worker runs this
+    loop, but only the holder of the refresher lease publishes; the others
+    check every ``interval`` seconds and take over once the lease expires.
+    """
+    lease = LeaderLease(
+        redis_client, "chunk_refresher", settings.CHUNK_REFRESH_LEASE_TTL
+    )
+    published_windows: set[tuple[str, int]] = set()
+
+    try:
+        while True:
+            due_windows = windows_to_publish()
+            try:
+                is_leader = await lease.acquire_or_renew()
+                CHUNK_REFRESHER_LEADER.set(1 if is_leader else 0)
+
+                script_ids = await get_active_scripts(redis_client) if is_leader else []
+                due = {
+                    (script_id, time_window)
+                    for script_id in script_ids
+                    for time_window in due_windows
+                }
+
+                for script_id, time_window in sorted(due - published_windows):
+                    # A previous leader may already have published this window
+                    if await publish_window(
+                        redis_client, script_id, get_chunks, time_window
+                    ):
+                        logger.info(
+                            f"Chunks of {script_id} updated for time window: "
+                            f"{time_window}"
+                        )
+                    # Pre-staged windows are checked again until they start
+                    if time_window <= current_window():
+                        published_windows.add((script_id, time_window))
+
+                published_windows.intersection_update(due)
+            except Exception as e:
+                logger.error("chunk_refresh_failed", windows=due_windows, error=str(e))
+            await asyncio.sleep(interval)
+    finally:
+        CHUNK_REFRESHER_LEADER.set(0)
+        try:
+            await lease.release()
+        except Exception as e:
+            logger.error("leader_lease_release_failed", error=str(e))
@@ -0,0 +1,65 @@
+"""
+Chunk encryption and signing as run on the crypto executor.
+
+Only depends on ``cryptography``, so the worker processes of
+``CRYPTO_EXECUTOR=process`` can import it without loading the app (which
+would build a KeyManager and talk to Vault in every child). Signing keys
+travel with each task as PEM and are parsed once per key id and process.
+"""
+
+import os
+from functools import lru_cache
+from typing import Optional
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# (key id, algorithm, private key PEM) of the key pair to sign with
+SigningKey = tuple[str, str, bytes]
+
+
+def encrypt_aes_gcm_raw(plaintext: bytes, key: bytes) -> tuple[bytes, bytes]:
+    """
+    Encrypts plaintext with AES-GCM. Returns the raw 12-byte nonce and the
+    ciphertext with the tag appended.
+    """
+    aesgcm = AESGCM(key)
+    nonce = os.urandom(12)
+    return nonce, aesgcm.encrypt(nonce, plaintext, None)
+
+
+def sign_with_private_key(private_key: any, algorithm: str, data: bytes) -> bytes:
+    """Sign with RSA PKCS#1 v1.5 and SHA-256, or Ed25519"""
+    if algorithm == "ed25519":
+        return private_key.sign(data)
+
+    return private_key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+
+
+@lru_cache(maxsize=4)
+def _load_private_key(key_id: str, private_pem: bytes) -> any:
+    return serialization.load_pem_private_key(private_pem, password=None)
+
+
+def seal_chunks(
+    raw_chunks: list[bytes], ephemeral_key: bytes, signing_key: Optional[SigningKey]
+) -> tuple[list[tuple[bytes, bytes]], Optional[bytes]]:
+    """
+    Encrypt a list of chunks, which were already transformed when their
+    script was loaded, and, given a signing key, sign the concatenation of
+    their nonces and ciphertexts. Returns raw bytes; base64 is only applied
+    for JSON responses.
+    """
+    sealed = [encrypt_aes_gcm_raw(raw_chunk, ephemeral_key) for raw_chunk in raw_chunks]
+
+    signature = None
+    if signing_key is not None:
+        key_id, algorithm, private_pem = signing_key
+        signature = sign_with_private_key(
+            _load_private_key(key_id, private_pem),
+            algorithm,
+            b"".join(nonce + ciphertext for nonce, ciphertext in sealed),
+        )
+
+    return sealed, signature
@@ -1,66 +1,266 @@
-import asyncio
-import json
-
-import redis
+import hashlib
+import itertools
+import os
 import time
-from random import shuffle
+from typing import Iterator, Optional
 
 from app.core.config import get_settings
-from app.core.logging_config import configure_logger
+from app.utils.lua_lexer import iter_tokens
 
 settings = get_settings()
-logger = configure_logger()
-r = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0)
 
 
-async def chunk_lua_script(script: str, chunk_size: int) -> list[str]:
-    """Split a Lua script into chunks of a given size."""
-    lines = script.split("\n")
-    chunks = []
+async def chunk_lua_script(script: str, target_bytes: int) -> list[str]:
+    """Split a Lua script into chunks of roughly ``target_bytes`` each."""
+    return chunk_lua_source(script.encode("utf-8"), target_bytes)
 
-    for i in range(0, len(lines), chunk_size):
-        chunk = lines[i : i + chunk_size]
-        chunk_header = f"-- chunk {len(chunks)}\n"
-        chunks.append(chunk_header + "\n".join(chunk))
 
-    return chunks
+def _split_points(source: bytes) -> Iterator[tuple[int, int, int]]:
+    """
+    Yield ``(cut_end, next_start, priority)`` for every place a chunk may end.
 
+    Chunks are joined with a newline on the client, so a chunk may end on a
+    single whitespace character (which is dropped and replaced by that
+    newline) or directly between two tokens. Newlines are preferred (2), then
+    other whitespace (1), then bare token boundaries (0). Nothing splits in
+    front of ``(``, which Lua 5.1 would read as an ambiguous call.
+    """
+    previous_kind = None
+    whitespace_points = []
 
-def update_chunks(chunks: list[str], time_window: int) -> None:
-    """Update the Redis cache with the given chunks."""
-    old_metadata_keys = r.keys("chunk_metadata:*")
-    for metadata_key in old_metadata_keys:
-        old_metadata = r.get(metadata_key)
-        if old_metadata:
-            old_metadata = json.loads(old_metadata)
-            for chunk_key in old_metadata["chunks"].values():
-                r.delete(chunk_key)  # Remove old chunk keys
-            r.delete(metadata_key)  # Remove old metadata
+    for kind, start, end in iter_tokens(source):
+        if kind == "whitespace":
+            whitespace_points = [
+                (position, position + 1, 2 if source[position] == 0x0A else 1)
+                for position in range(start, end)
+            ]
+        else:
+            opens_call = source[start] == 0x28  # "("
+            for point in whitespace_points:
+                if point[2] == 2 or not opens_call:
+                    yield point
+            if previous_kind not in (None, "whitespace") and not opens_call:
+                yield start, start, 0
+            whitespace_points = []
 
-    chunk_metadata = {
-        "chunks": {},
-        "order": [],
-    }
+        previous_kind = kind
+
+    yield from whitespace_points
+
+
+def _pick_split(
+    candidates: list[tuple[int, int, int]], chunk_start: int, target_bytes: int
+) -> Optional[tuple[int, int, int]]:
+    """
+    Pick where to end a chunk: the latest split point of the best priority
+    that still fills at least half the budget, else the latest split point.
+    """
+    for priority in (2, 1, 0):
+        for candidate in reversed(candidates):
+            if candidate[2] == priority and (
+                candidate[0] - chunk_start >= target_bytes // 2
+            ):
+                return candidate
+
+    return candidates[-1] if candidates else None
+
+
+def chunk_spans(source: bytes, target_bytes: int) -> list[tuple[int, int]]:
+    """
+    Return the ``(start, end)`` byte spans that split a Lua source buffer
+    into chunks of at most ``target_bytes`` bytes, only ever cutting between
+    tokens so no string, long string or comment is split. A single token
+    larger than the budget ends up in an oversized chunk.
+    """
+    spans = []
+    chunk_start = 0
+    candidates: list[tuple[int, int, int]] = []
+    # The end of the source closes the last chunk like any other split point
+    end_of_source = (len(source), len(source), 0)
+
+    for split in itertools.chain(_split_points(source), [end_of_source]):
+        while split[0] - chunk_start > target_bytes:
+            chosen = _pick_split(candidates, chunk_start, target_bytes) or split
+            spans.append((chunk_start, chosen[0]))
+            chunk_start = chosen[1]
+            candidates = [c for c in candidates if c[0] > chunk_start]
+            if chosen is split:
+                break
+
+        if split[0] > chunk_start:
+            candidates.append(split)
+
+    if chunk_start < len(source) or not spans:
+        spans.append((chunk_start, len(source)))
+
+    return spans
 
-    for idx, chunk in enumerate(chunks):
-        chunk_key = f"chunk:{time_window}:{idx}"
-        r.set(chunk_key, chunk, ex=120)  # Store new chunk with expiration
-        chunk_metadata["chunks"][idx] = chunk_key
-        chunk_metadata["order"].append(idx)
 
-    shuffle(chunk_metadata["order"])
+def render_chunks(source: bytes, spans: list[tuple[int, int]]) -> list[str]:
+    """
+    Cut a source along its spans. Chunks carry no index of their own, the
+    order lives in the manifest, so a chunk's bytes (and hash) only depend
+    on its content.
+    """
+    return [source[start:end].decode("utf-8") for start, end in spans]
 
-    r.set(f"chunk_metadata:{time_window}", json.dumps(chunk_metadata), ex=120)
 
-    logger.info(
-        f"Updated Redis with {len(chunks)} chunks for time window {time_window}"
+def chunk_lua_source(source: bytes, target_bytes: int) -> list[str]:
+    """Split a Lua source buffer into chunks of at most ``target_bytes`` bytes."""
+    return render_chunks(source, chunk_spans(source, target_bytes))
+
+
+def _spans_are_valid(source: bytes, spans: list[tuple[int, int]]) -> bool:
+    """Check that spans tile a source and only ever cut at split points"""
+    split_pairs = {(split[0], split[1]) for split in _split_points(source)}
+    boundaries = [(spans[idx][1], spans[idx + 1][0]) for idx in range(len(spans) - 1)]
+    if spans[-1][1] != len(source):
+        boundaries.append((spans[-1][1], len(source)))
+
+    return spans[0][0] == 0 and all(
+        boundary in split_pairs for boundary in boundaries
     )
 
 
-async def refresh_chunks(chunks: list[str], interval: int) -> None:
-    """Refresh the chunks in the Redis cache at a given interval."""
-    while True:
-        time_window = int(time.time()) // 60
-        update_chunks(chunks, time_window)
-        logger.info(f"Chunks updated for time window: {time_window}")
-        await asyncio.sleep(interval)
+def rechunk_lua_source(
+    old_source: bytes,
+    old_spans: list[tuple[int, int]],
+    new_source: bytes,
+    target_bytes: int,
+) -> list[tuple[int, int]]:
+    """
+    Chunk a new version of a source, keeping the spans of the old version
+    that lie entirely in the unchanged prefix or suffix and only chunking
+    the edited region in between. Unchanged chunks keep their exact bytes,
+    so their content hashes (and stored blobs) survive the edit even when
+    it shifts their index. Falls back to a full chunking if the reused
+    spans would not cut the new source at token boundaries.
+    """
+    if not old_spans or not new_source:
+        return chunk_spans(new_source, target_bytes)
+
+    prefix = len(os.path.commonprefix([old_source, new_source]))
+    suffix = min(
+        len(os.path.commonprefix([old_source[::-1], new_source[::-1]])),
+        min(len(old_source), len(new_source)) - prefix,
+    )
+    shift = len(new_source) - len(old_source)
+
+    # Spans whose bytes and the byte after them are in the common prefix
+    head = []
+    for idx, span in enumerate(old_spans):
+        next_start = (
+            old_spans[idx + 1][0] if idx + 1 < len(old_spans) else len(old_source)
+        )
+        if next_start >= prefix:
+            break
+        head.append(span)
+    region_start = old_spans[len(head)][0] if head else 0
+
+    # Spans entirely in the common suffix that still leave room for the head
+    tail_from = len(old_spans)
+    while (
+        tail_from > len(head)
+        and old_spans[tail_from - 1][0] >= len(old_source) - suffix
+        and old_spans[tail_from - 1][0] + shift >= region_start
+    ):
+        tail_from -= 1
+    tail = [(start + shift, end + shift) for start, end in old_spans[tail_from:]]
+
+    if tail and 0 < tail_from:
+        gap = old_spans[tail_from][0] - old_spans[tail_from - 1][1]
+        region_end = max(tail[0][0] - gap, region_start)
+    else:
+        region_end = tail[0][0] if tail else len(new_source)
+
+    middle = []
+    if region_end > region_start:
+        middle = [
+            (start + region_start, end + region_start)
+            for start, end in chunk_spans(
+                new_source[region_start:region_end], target_bytes
+            )
+        ]
+
+    spans = head + middle + tail
+    if not _spans_are_valid(new_source, spans):
+        return chunk_spans(new_source, target_bytes)
+
+    return spans
+
+
+def chunk_statistics(chunks: list[str]) -> dict[str, int | float]:
+    """Summarize chunk sizes in bytes (count, total, min, max, mean, p50, p95)."""
+    sizes = sorted(len(chunk.encode("utf-8")) for chunk in chunks)
+    if not sizes:
+        return {"count": 0, "total_bytes": 0}
+
+    return {
+        "count": len(sizes),
+        "total_bytes": sum(sizes),
+        "min_bytes": sizes[0],
+        "max_bytes": sizes[-1],
+        "mean_bytes": round(sum(sizes) / len(sizes), 1),
+        "p50_bytes": sizes[len(sizes) // 2],
+        "p95_bytes": sizes[min(len(sizes) - 1, int(len(sizes) * 0.95))],
+    }
+
+
+def metadata_key(script_id: str, time_window: int) -> str:
+    return f"chunk_metadata:{script_id}:{time_window}"
+
+
+def manifest_key(script_id: str, time_window: int) -> str:
+    return f"chunk_manifest:{script_id}:{time_window}"
+
+
+def chunk_blob_key(digest: str) -> str:
+    """Chunk bodies are stored once, under the SHA-256 listed in manifests"""
+    return f"chunk_blob:{digest}"
+
+
+def script_version_key(script_id: str, version: str) -> str:
+    return f"script_version:{script_id}:{version}"
+
+
+def script_version(chunk_hashes: list[str]) -> str:
+    """Identify a script version by the ordered hashes of its chunks"""
+    return hashlib.sha256("\n".join(chunk_hashes).encode("utf-8")).hexdigest()[:16]
+
+
+def diff_versions(old_hashes: list[str], new_hashes: list[str]) -> dict:
+    """
+    Compare the chunk hashes of two script versions. A chunk of the new
+    version is either unchanged (same hash at the same index), ``moved``
+    (its content exists at another index of the old version) or
+    ``changed`` and has to be downloaded.
+    """
+    old_indices = {}
+    for idx, digest in enumerate(old_hashes):
+        old_indices.setdefault(digest, idx)
+
+    changed = []
+    moved = {}
+    for idx, digest in enumerate(new_hashes):
+        if idx < len(old_hashes) and old_hashes[idx] == digest:
+            continue
+        if digest in old_indices:
+            moved[str(idx)] = old_indices[digest]
+        else:
+            changed.append(idx)
+
+    return {"count": len(new_hashes), "changed": changed, "moved": moved}
+
+
+def current_window(now: Optional[float] = None) -> int:
+    """Return the chunk time window the given (or current) time falls into."""
+    if now is None:
+        now = time.time()
+    return int(now) // settings.CHUNK_WINDOW_SECONDS
+
+
+def hash_chunk(chunk: str | bytes) -> str:
+    """Return the hex SHA-256 digest of a chunk as it is fed to AES-GCM."""
+    if isinstance(chunk, str):
+        chunk = chunk.encode("utf-8")
+    return hashlib.sha256(chunk).hexdigest()
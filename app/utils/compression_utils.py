@@ -0,0 +1,52 @@
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # Optional, only needed for CHUNK_COMPRESSION=zstd
+    zstandard = None
+
+CHUNK_CODECS = ("none", "zlib", "zstd")
+
+
+def check_codec(codec: str) -> None:
+    """Fail early on a codec that compress_chunk could not use"""
+    if codec not in CHUNK_CODECS:
+        raise ValueError(f"Unsupported chunk compression: {codec}")
+
+    if codec == "zstd" and zstandard is None:
+        raise RuntimeError("CHUNK_COMPRESSION=zstd requires the zstandard package")
+
+
+def compress_chunk(data: bytes, codec: str, level: int) -> bytes:
+    """
+    Compress a chunk before it is encrypted. Clients decrypt first and then
+    decompress with the codec advertised next to the ciphertext.
+    """
+    if codec == "none":
+        return data
+
+    if codec == "zlib":
+        return zlib.compress(data, level)
+
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("CHUNK_COMPRESSION=zstd requires the zstandard package")
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    raise ValueError(f"Unsupported chunk compression: {codec}")
+
+
+def decompress_chunk(data: bytes, codec: str) -> bytes:
+    """Reverse compress_chunk, as clients do after decrypting."""
+    if codec == "none":
+        return data
+
+    if codec == "zlib":
+        return zlib.decompress(data)
+
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("CHUNK_COMPRESSION=zstd requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    raise ValueError(f"Unsupported chunk compression: {codec}")
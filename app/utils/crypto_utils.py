@@ -1,13 +1,17 @@
 import os
 import base64
 
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 
 from app.core.config import get_settings
 from app.core.secrets import get_vault_client
 from app.core.key_management import KeyManager
+from app.utils.chunk_sealing import (
+    SigningKey,
+    encrypt_aes_gcm_raw,
+    sign_with_private_key,
+)
 
 settings = get_settings()
 key_manager = KeyManager(get_vault_client())
@@ -25,9 +29,7 @@ def encrypt_aes_gcm(plaintext: bytes, key: bytes) -> dict[str, str]:
     base64-encoded ciphertext, nonce, and tag (though cryptography
     puts the tag in the ciphertext).
     """
-    aesgcm = AESGCM(key)
-    nonce = os.urandom(12)
-    ciphertext = aesgcm.encrypt(nonce, plaintext, None)
+    nonce, ciphertext = encrypt_aes_gcm_raw(plaintext, key)
 
     return {
         "nonce": base64.b64encode(nonce).decode(),
@@ -35,20 +37,49 @@ def encrypt_aes_gcm(plaintext: bytes, key: bytes) -> dict[str, str]:
     }
 
 
+def _sign(signing_keys: dict, data: bytes) -> bytes:
+    """Sign with the private key of a key pair, using the pair's algorithm"""
+    return sign_with_private_key(
+        signing_keys["private_key"], signing_keys["algorithm"], data
+    )
+
+
 def sign_data(data: bytes) -> str:
     """
-    Sign data with RSA private key using PKCS#1 v1.5 and SHA256.
-    Return base64-encoded signature.
+    Sign data with the active private key: RSA PKCS#1 v1.5 with SHA256 or
+    Ed25519, depending on the key pair. Return base64-encoded signature.
     """
-    private_key, public_key = (
-        serialization.load_pem_private_key(
-            key_manager.get_active_key()["private_key"], password=None
-        ),  # TODO: Add password
-        serialization.load_pem_public_key(key_manager.get_active_key()["public_key"]),
+    return base64.b64encode(sign_data_raw(data)).decode()
+
+
+def sign_data_raw(data: bytes) -> bytes:
+    """Same as sign_data, but return the raw signature bytes"""
+    return _sign(key_manager.get_signing_keys(), data)
+
+
+def sign_data_with_key(data: bytes) -> tuple[str, str, str]:
+    """
+    Same as sign_data, but also return the id and algorithm of the key pair
+    that produced the signature so clients can pick the matching public key.
+    """
+    signing_keys = key_manager.get_signing_keys()
+    signature = _sign(signing_keys, data)
+
+    return (
+        base64.b64encode(signature).decode(),
+        signing_keys["key_id"],
+        signing_keys["algorithm"],
     )
 
-    signature = private_key.sign(data, padding.PKCS1v15(), hashes.SHA256())
-    return base64.b64encode(signature).decode()
+
+def signing_key_material() -> SigningKey:
+    """Return the active key pair in the form ``seal_chunks`` signs with"""
+    signing_keys = key_manager.get_signing_keys()
+    return (
+        signing_keys["key_id"],
+        signing_keys["algorithm"],
+        signing_keys["private_pem"],
+    )
 
 
 def verify_signature(data: bytes, signature_b64: str) -> bool:
@@ -56,17 +87,16 @@ def verify_signature(data: bytes, signature_b64: str) -> bool:
     Verify signature with the public key. Not typically needed server-side,
     but included for reference.
     """
-    private_key, public_key = (
-        serialization.load_pem_private_key(
-            key_manager.get_active_key()["private_key"], password=None
-        ),  # TODO: Add password
-        serialization.load_pem_public_key(key_manager.get_active_key()["public_key"]),
-    )
+    signing_keys = key_manager.get_signing_keys()
+    public_key = signing_keys["public_key"]
 
     signature = base64.b64decode(signature_b64)
     # noinspection PyBroadException
     try:
-        public_key.verify(signature, data, padding.PKCS1v15(), hashes.SHA256())
+        if signing_keys["algorithm"] == "ed25519":
+            public_key.verify(signature, data)
+        else:
+            public_key.verify(signature, data, padding.PKCS1v15(), hashes.SHA256())
         return True
     except:
         return False
@@ -1,2 +0,0 @@
-def mock_encrypt(lua_code: str) -> str:
-    return lua_code
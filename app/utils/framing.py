@@ -0,0 +1,89 @@
+"""
+Binary framing for chunk responses, negotiated with
+``Accept: application/octet-stream``. All integers are big-endian.
+
+    header     version u8 | codec u8 | flags u8 | window u64 | count u32
+    record     index u32 | nonce 12B | length u32 | ciphertext
+               [signature length u16 | signature]   if FLAG_RECORD_SIGNATURES
+    trailer    [signature length u16 | signature]   if FLAG_TRAILING_SIGNATURE
+
+A record signature covers ``nonce + ciphertext`` of that record, a trailing
+signature covers the ``nonce + ciphertext`` of every record in order, the
+same bytes the base64 JSON responses sign.
+"""
+
+import struct
+from typing import Iterable, Optional
+
+from fastapi import Request
+
+BINARY_MEDIA_TYPE = "application/octet-stream"
+FRAME_VERSION = 1
+CODEC_IDS = {"none": 0, "zlib": 1, "zstd": 2}
+
+FLAG_RECORD_SIGNATURES = 0x01
+FLAG_TRAILING_SIGNATURE = 0x02
+
+_HEADER = struct.Struct(">BBBQI")
+_RECORD = struct.Struct(">I12sI")
+_SIGNATURE = struct.Struct(">H")
+
+
+def wants_binary(request: Request) -> bool:
+    """
+    Check whether the client's Accept header lists the binary media type
+    with a non-zero quality. Wildcards keep the JSON default.
+    """
+    for media_range in request.headers.get("accept", "").split(","):
+        media_type, *parameters = [part.strip() for part in media_range.split(";")]
+        if media_type.lower() != BINARY_MEDIA_TYPE:
+            continue
+
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+
+    return False
+
+
+def encode_header(time_window: int, compression: str, count: int, flags: int) -> bytes:
+    return _HEADER.pack(
+        FRAME_VERSION, CODEC_IDS[compression], flags, time_window, count
+    )
+
+
+def encode_signature(signature: bytes) -> bytes:
+    return _SIGNATURE.pack(len(signature)) + signature
+
+
+def encode_record(
+    index: int, nonce: bytes, ciphertext: bytes, signature: Optional[bytes] = None
+) -> bytes:
+    record = _RECORD.pack(index, nonce, len(ciphertext)) + ciphertext
+    if signature is not None:
+        record += encode_signature(signature)
+    return record
+
+
+def encode_frame(
+    time_window: int,
+    compression: str,
+    records: Iterable[tuple[int, bytes, bytes]],
+    signature: Optional[bytes] = None,
+) -> bytes:
+    """Encode ``(index, nonce, ciphertext)`` records with an optional trailer"""
+    records = list(records)
+    flags = FLAG_TRAILING_SIGNATURE if signature is not None else 0
+
+    frame = bytearray(encode_header(time_window, compression, len(records), flags))
+    for index, nonce, ciphertext in records:
+        frame += encode_record(index, nonce, ciphertext)
+    if signature is not None:
+        frame += encode_signature(signature)
+
+    return bytes(frame)
@@ -0,0 +1,87 @@
+import re
+from typing import Iterator
+
+LUA_KEYWORDS = frozenset(
+    {
+        "and",
+        "break",
+        "do",
+        "else",
+        "elseif",
+        "end",
+        "false",
+        "for",
+        "function",
+        "goto",
+        "if",
+        "in",
+        "local",
+        "nil",
+        "not",
+        "or",
+        "repeat",
+        "return",
+        "then",
+        "true",
+        "until",
+        "while",
+    }
+)
+
+_TOKEN = re.compile(
+    rb"""
+    (?P<whitespace>[ \t\r\n\f\v]+)
+    |(?P<long_comment>--\[=*\[)
+    |(?P<comment>--[^\r\n]*)
+    |(?P<long_string>\[=*\[)
+    |(?P<string>
+        "(?:[^"\\\r\n]|\\z[ \t\r\n\f\v]*|\\(?:\r\n|\n\r|(?s:.)))*"?
+        |'(?:[^'\\\r\n]|\\z[ \t\r\n\f\v]*|\\(?:\r\n|\n\r|(?s:.)))*'?
+    )
+    |(?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<number>
+        0[xX](?:[0-9A-Fa-f]*\.?[0-9A-Fa-f]*)(?:[pP][+-]?[0-9]+)?
+        |(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?
+    )
+    |(?P<op>\.\.\.|\.\.|==|~=|<=|>=|<<|>>|//|::|[-+*/%^\#&~|<>=(){}\[\];:,.])
+    |(?P<other>[\x80-\xff]+|.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+def _long_bracket_end(source: bytes, open_end: int, level: int) -> int:
+    """Return the offset just past the ``]=*]`` closing a long bracket"""
+    close = source.find(b"]" + b"=" * level + b"]", open_end)
+    if close == -1:
+        return len(source)
+    return close + level + 2
+
+
+def iter_tokens(source: bytes) -> Iterator[tuple[str, int, int]]:
+    """
+    Yield ``(kind, start, end)`` for every token of a Lua source buffer.
+
+    Kinds are ``whitespace``, ``comment``, ``string``, ``keyword``, ``name``,
+    ``number``, ``op`` and ``other``. Long strings and long comments are a
+    single token, so nothing that splits on token boundaries can cut through
+    them. The lexer is tolerant: malformed input is returned as ``other`` or
+    unterminated tokens instead of raising.
+    """
+    position = 0
+    source_length = len(source)
+
+    while position < source_length:
+        match = _TOKEN.match(source, position)
+        kind = match.lastgroup
+        end = match.end()
+
+        if kind in ("long_comment", "long_string"):
+            level = source[position:end].count(b"=")
+            end = _long_bracket_end(source, end, level)
+            kind = "comment" if kind == "long_comment" else "string"
+        elif kind == "name" and source[position:end].decode() in LUA_KEYWORDS:
+            kind = "keyword"
+
+        yield kind, position, end
+        position = end
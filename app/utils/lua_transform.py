@@ -0,0 +1,392 @@
+"""
+Source-to-source Lua transformation applied once per script version before
+it is chunked: local renaming, string encoding and minification.
+
+Every stage works on the token stream of ``app.utils.lua_lexer`` and errs on
+the side of leaving code alone: a local is only renamed if every use of its
+name provably refers to a local, and strings the lexer could not make sense
+of are kept verbatim.
+"""
+
+import hashlib
+import re
+from typing import Optional
+
+from app.utils.lua_lexer import LUA_KEYWORDS, iter_tokens
+
+# Names that carry meaning beyond their binding
+_RESERVED_NAMES = frozenset({"self", "_ENV", "_G", "arg"})
+
+_BINARY_OPERATORS = frozenset(
+    {
+        b"+", b"-", b"*", b"/", b"//", b"%", b"^", b"..",
+        b"==", b"~=", b"<", b"<=", b">", b">=",
+        b"&", b"|", b"~", b"<<", b">>",
+        b"and", b"or",
+    }
+)  # fmt: skip
+
+# Tokens that, after a complete expression, continue that expression
+_CONTINUATIONS = _BINARY_OPERATORS | {b".", b":", b"[", b"(", b"{", b","}
+
+_EXPRESSION_END_KEYWORDS = frozenset({b"nil", b"true", b"false", b"end"})
+
+_ALIAS_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+_SHORT_ESCAPES = {
+    ord("a"): b"\a",
+    ord("b"): b"\b",
+    ord("f"): b"\f",
+    ord("n"): b"\n",
+    ord("r"): b"\r",
+    ord("t"): b"\t",
+    ord("v"): b"\v",
+    ord("\\"): b"\\",
+    ord('"'): b'"',
+    ord("'"): b"'",
+}
+
+_LONG_BRACKET_OPEN = re.compile(rb"\[=*\[")
+_LINE_BREAK = re.compile(rb"\r\n|\n\r|\r|\n")
+
+
+class _Token:
+    __slots__ = ("kind", "text")
+
+    def __init__(self, kind: str, text: bytes) -> None:
+        self.kind = kind
+        self.text = text
+
+
+def _significant_tokens(source: bytes) -> list[_Token]:
+    """Lex a source, dropping whitespace and comments"""
+    return [
+        _Token(kind, source[start:end])
+        for kind, start, end in iter_tokens(source)
+        if kind not in ("whitespace", "comment")
+    ]
+
+
+def _ends_expression(token: _Token) -> bool:
+    if token.kind in ("name", "number", "string"):
+        return True
+    if token.kind == "keyword":
+        return token.text in _EXPRESSION_END_KEYWORDS
+    return token.text in (b")", b"]", b"}", b"...")
+
+
+def _find_renamable(tokens: list[_Token]) -> tuple[list[int], set[str]]:
+    """
+    Resolve every variable occurrence against a conservative model of Lua's
+    lexical scoping.
+
+    Returns the indices of all variable occurrences (declarations and uses,
+    but not fields, table keys, labels or attributes) and the set of names
+    that can be renamed: names that are declared as locals and never used
+    in a position that resolves to a global. Scopes are closed no later and
+    locals activated no earlier than Lua does, so any imprecision turns a
+    name into a global and keeps it from being renamed.
+    """
+    scopes: list[set[str]] = [set()]
+    # Open brackets, with the scope depth they were opened at
+    brackets: list[tuple[bytes, int]] = []
+    occurrences: list[int] = []
+    declared: set[str] = set()
+    free: set[str] = set()
+
+    # ``local`` statements whose names are not visible yet
+    pending_locals: list[dict] = []
+    # ``for`` loop variables, visible from the ``do`` of the loop
+    pending_for: Optional[dict] = None
+    # ``function`` header state: None, "name" or "params"
+    function_state: Optional[str] = None
+    function_params: list[str] = []
+    local_function = False
+
+    def depth() -> dict:
+        return {"scopes": len(scopes), "brackets": len(brackets)}
+
+    def at_depth(state: Optional[dict]) -> bool:
+        return (
+            state is not None
+            and state["scopes"] == len(scopes)
+            and state["brackets"] == len(brackets)
+        )
+
+    def open_scope(names: Optional[list[str]] = None) -> None:
+        scopes.append(set(names or ()))
+
+    def close_scope() -> None:
+        if len(scopes) > 1:
+            scopes.pop()
+
+    for index, token in enumerate(tokens):
+        text = token.text
+        previous = tokens[index - 1] if index else None
+        following = tokens[index + 1] if index + 1 < len(tokens) else None
+
+        # Activate a pending local once its statement has ended
+        if pending_locals and at_depth(pending_locals[-1]):
+            pending = pending_locals[-1]
+            if pending["phase"] == "names":
+                if text == b"=":
+                    pending["phase"] = "values"
+                elif text not in (b",", b"<", b">") and not (
+                    token.kind == "name" and previous.text in (b"local", b",", b"<")
+                ):
+                    scopes[-1].update(pending_locals.pop()["names"])
+            elif (
+                _ends_expression(previous)
+                and text not in _CONTINUATIONS
+                and token.kind != "string"
+            ):
+                scopes[-1].update(pending_locals.pop()["names"])
+
+        if token.kind == "keyword":
+            if text == b"local":
+                if following is not None and following.text == b"function":
+                    local_function = True
+                else:
+                    pending_locals.append({"names": [], "phase": "names", **depth()})
+            elif text == b"function":
+                function_state = "name"
+                function_params = []
+            elif text == b"for":
+                pending_for = {"names": [], "collecting": True, **depth()}
+            elif text == b"in" and at_depth(pending_for):
+                pending_for["collecting"] = False
+            elif text == b"do":
+                loop_names = []
+                if at_depth(pending_for):
+                    loop_names = pending_for["names"]
+                    pending_for = None
+                open_scope(loop_names)
+            elif text in (b"then", b"repeat"):
+                open_scope()
+            elif text == b"else":
+                close_scope()
+                open_scope()
+            elif text in (b"end", b"elseif", b"until"):
+                close_scope()
+            continue
+
+        if token.kind == "op":
+            if text in (b"(", b"[", b"{"):
+                brackets.append((text, len(scopes)))
+                if text == b"(" and function_state == "name":
+                    function_state = "params"
+            elif text in (b")", b"]", b"}"):
+                if brackets:
+                    brackets.pop()
+                if text == b")" and function_state == "params":
+                    open_scope(function_params)
+                    function_state = None
+            elif text == b"=" and at_depth(pending_for):
+                pending_for["collecting"] = False
+            continue
+
+        if token.kind != "name":
+            continue
+
+        name = text.decode()
+
+        if previous is not None and (
+            previous.text in (b".", b":", b"::")
+            or (previous.kind == "keyword" and previous.text == b"goto")
+        ):
+            continue  # Field, method, label or goto target
+
+        if (
+            brackets
+            and brackets[-1] == (b"{", len(scopes))
+            and previous.text in (b"{", b",", b";")
+            and following is not None
+            and following.text == b"="
+        ):
+            continue  # Table constructor key
+
+        pending = pending_locals[-1] if pending_locals else None
+        declaring = at_depth(pending) and pending["phase"] == "names"
+        if declaring and previous.text == b"<":
+            continue  # Attribute such as <const>
+
+        occurrences.append(index)
+
+        if declaring:
+            pending["names"].append(name)
+            declared.add(name)
+        elif at_depth(pending_for) and pending_for["collecting"]:
+            pending_for["names"].append(name)
+            declared.add(name)
+        elif function_state == "params":
+            function_params.append(name)
+            declared.add(name)
+        elif function_state == "name" and local_function:
+            scopes[-1].add(name)
+            declared.add(name)
+            local_function = False
+        elif not any(name in scope for scope in scopes):
+            free.add(name)
+
+    return occurrences, declared - free - _RESERVED_NAMES
+
+
+def _alias(name: str, salt: str, taken: set[str]) -> str:
+    """
+    Derive a short alias from a keyed hash of the name, so the same local
+    gets the same alias in every version of a script.
+    """
+    digest = int.from_bytes(
+        hashlib.blake2b(name.encode(), key=salt.encode()[:64]).digest(), "big"
+    )
+    encoded = ""
+    while digest:
+        digest, remainder = divmod(digest, len(_ALIAS_ALPHABET))
+        encoded += _ALIAS_ALPHABET[remainder]
+
+    for length in range(4, len(encoded) + 1):
+        alias = f"_{encoded[:length]}"
+        if alias not in taken:
+            return alias
+
+    raise ValueError(f"Could not derive a unique alias for {name}")
+
+
+def rename_locals(tokens: list[_Token], salt: str = "") -> None:
+    """Rename every provably local variable in place"""
+    occurrences, renamable = _find_renamable(tokens)
+
+    taken = {token.text.decode() for token in tokens if token.kind == "name"}
+    taken |= LUA_KEYWORDS
+    aliases = {}
+    for name in sorted(renamable):
+        aliases[name] = _alias(name, salt, taken)
+        taken.add(aliases[name])
+
+    for index in occurrences:
+        alias = aliases.get(tokens[index].text.decode())
+        if alias:
+            tokens[index].text = alias.encode()
+
+
+def _decode_string(literal: bytes) -> Optional[bytes]:
+    """Return the value of a Lua string literal, or None if unsure"""
+    long_open = _LONG_BRACKET_OPEN.match(literal)
+    if long_open:
+        level = long_open.end() - 2
+        closing = b"]" + b"=" * level + b"]"
+        if not literal.endswith(closing) or len(literal) < 2 * len(closing):
+            return None
+        body = literal[long_open.end() : -len(closing)]
+        first_break = _LINE_BREAK.match(body)
+        if first_break:
+            body = body[first_break.end() :]
+        return _LINE_BREAK.sub(b"\n", body)
+
+    if len(literal) < 2 or literal[-1] != literal[0]:
+        return None
+
+    body = literal[1:-1]
+    value = bytearray()
+    position = 0
+    while position < len(body):
+        byte = body[position]
+        if byte != 0x5C:  # backslash
+            value.append(byte)
+            position += 1
+            continue
+
+        if position + 1 >= len(body):
+            return None
+        escape = body[position + 1]
+        position += 2
+
+        if escape in _SHORT_ESCAPES:
+            value += _SHORT_ESCAPES[escape]
+        elif escape in (0x0A, 0x0D):
+            line_break = _LINE_BREAK.match(body, position - 1)
+            value += b"\n"
+            position = line_break.end()
+        elif escape == ord("z"):
+            while position < len(body) and body[position] in b" \t\r\n\f\v":
+                position += 1
+        elif escape == ord("x"):
+            hex_digits = body[position : position + 2]
+            if not re.fullmatch(rb"[0-9A-Fa-f]{2}", hex_digits):
+                return None
+            value.append(int(hex_digits, 16))
+            position += 2
+        elif 0x30 <= escape <= 0x39:
+            digits = re.match(rb"[0-9]{1,3}", body[position - 1 : position + 2])
+            number = int(digits.group())
+            if number > 255:
+                return None
+            value.append(number)
+            position += len(digits.group()) - 1
+        elif escape == ord("u"):
+            code_point = re.match(rb"\{([0-9A-Fa-f]+)\}", body[position:])
+            if not code_point or int(code_point.group(1), 16) > 0x10FFFF:
+                return None
+            value += chr(int(code_point.group(1), 16)).encode(
+                "utf-8", "surrogatepass"
+            )
+            position += code_point.end()
+        else:
+            return None
+
+    return bytes(value)
+
+
+def encode_strings(tokens: list[_Token]) -> None:
+    """Rewrite every string literal as decimal escapes, in place"""
+    for token in tokens:
+        if token.kind != "string":
+            continue
+        value = _decode_string(token.text)
+        if value is not None:
+            token.text = b'"' + b"".join(b"\\%d" % byte for byte in value) + b'"'
+
+
+def _needs_space(previous: _Token, token: _Token) -> bool:
+    """Check whether two tokens would lex differently without a space"""
+    if previous.kind in ("string", "comment"):
+        return False
+    if previous.kind == "number" and re.match(rb"[A-Za-z0-9_.]", token.text):
+        return True  # Lua reads any alphanumeric run after a digit as the number
+    _, _, end = next(iter_tokens(previous.text + token.text))
+    return end != len(previous.text)
+
+
+def minify(tokens: list[_Token]) -> bytes:
+    """Join tokens with a single space only where Lua needs one"""
+    output = bytearray()
+    previous = None
+    for token in tokens:
+        if previous is not None and _needs_space(previous, token):
+            output += b" "
+        output += token.text
+        previous = token
+    return bytes(output)
+
+
+def transform_lua(
+    source: bytes, rename: bool = True, encode: bool = True, salt: str = ""
+) -> bytes:
+    """
+    Minify a Lua source, optionally renaming its locals and encoding its
+    string literals. Deterministic: the same source, flags and salt always
+    produce the same output.
+    """
+    shebang = b""
+    if source.startswith(b"#"):
+        line_end = source.find(b"\n")
+        line_end = len(source) if line_end == -1 else line_end + 1
+        shebang, source = source[:line_end], source[line_end:]
+
+    tokens = _significant_tokens(source)
+    if rename:
+        rename_locals(tokens, salt)
+    if encode:
+        encode_strings(tokens)
+
+    return shebang + minify(tokens)
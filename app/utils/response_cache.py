@@ -0,0 +1,98 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import get_settings
+from app.monitoring.metrics import SESSION_RESPONSE_CACHE
+
+settings = get_settings()
+
+# Rough per-entry bookkeeping cost on top of the cached bytes
+_ENTRY_OVERHEAD_BYTES = 256
+
+
+def token_digest(token: str) -> bytes:
+    """Key sessions by a digest so raw tokens are not kept in memory"""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class SessionResponseCache:
+    """
+    Per-worker cache of sealed chunk responses, keyed by session, script,
+    window and chunk index, so a client retrying a chunk gets the very same
+    nonce, ciphertext and signature back instead of paying for the crypto
+    again. Re-sending an identical ciphertext reveals nothing new.
+
+    Entries live in an LRU bounded by ``max_bytes`` and are dropped as soon
+    as a newer window of their script is cached.
+    """
+
+    def __init__(self, max_bytes: int = settings.SESSION_RESPONSE_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple] = OrderedDict()
+        self._sizes: dict[tuple, int] = {}
+        self._latest_windows: dict[str, int] = {}
+        self._size = 0
+
+    def _remove(self, key: tuple) -> None:
+        del self._entries[key]
+        self._size -= self._sizes.pop(key)
+
+    def _advance_window(self, script_id: str, time_window: int) -> None:
+        """Drop every entry of a script older than the given window"""
+        latest_window = self._latest_windows.get(script_id)
+        if latest_window is not None and time_window <= latest_window:
+            return
+
+        self._latest_windows[script_id] = time_window
+        for key in [
+            k for k in self._entries if k[1] == script_id and k[2] < time_window
+        ]:
+            self._remove(key)
+
+    def get(
+        self, token: str, script_id: str, time_window: int, chunk_index: int
+    ) -> Optional[tuple[bytes, bytes, Optional[bytes]]]:
+        """Return the cached ``(nonce, ciphertext, signature)`` of a chunk"""
+        if self.max_bytes <= 0:
+            return None
+
+        key = (token_digest(token), script_id, time_window, chunk_index)
+        sealed = self._entries.get(key)
+        if sealed is None:
+            SESSION_RESPONSE_CACHE.labels(result="miss").inc()
+            return None
+
+        self._entries.move_to_end(key)
+        SESSION_RESPONSE_CACHE.labels(result="hit").inc()
+        return sealed
+
+    def put(
+        self,
+        token: str,
+        script_id: str,
+        time_window: int,
+        chunk_index: int,
+        sealed: tuple[bytes, bytes, Optional[bytes]],
+    ) -> None:
+        if self.max_bytes <= 0:
+            return
+
+        self._advance_window(script_id, time_window)
+        if time_window < self._latest_windows[script_id]:
+            return
+
+        key = (token_digest(token), script_id, time_window, chunk_index)
+        if key in self._entries:
+            self._remove(key)
+
+        size = _ENTRY_OVERHEAD_BYTES + sum(len(part or b"") for part in sealed)
+        self._entries[key] = sealed
+        self._sizes[key] = size
+        self._size += size
+
+        while self._size > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+
+session_response_cache = SessionResponseCache()
@@ -78,3 +78,25 @@ def test_authentication_flow() -> None:
     token = response.json()["session_token"]
     response = client.get("/api/v1/script/script_chunk/0", params={"token": token})
     assert response.status_code == 200
+
+
+def test_batch_chunk_fetch(client) -> None:
+    """Test fetching a range of chunks in one request"""
+    response = client.post(
+        "/api/v1/auth/auth", json={"user_id": 1, "username": "test_user"}
+    )
+    assert response.status_code == 200
+    token = response.json()["session_token"]
+
+    response = client.get(
+        "/api/v1/script/script_chunks",
+        params={"token": token, "start": 0, "end": 2},
+    )
+    assert response.status_code == 200
+    assert [chunk["index"] for chunk in response.json()["chunks"]] == [0, 1]
+
+    response = client.get(
+        "/api/v1/script/script_chunks",
+        params={"token": token, "start": 0, "indices": [1]},
+    )
+    assert response.status_code == 400
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+from app.utils import chunk_cache
+from app.utils.chunk_cache import WindowChunkCache
+from app.utils.chunking_utils import (
+    chunk_blob_key,
+    hash_chunk,
+    manifest_key,
+    metadata_key,
+)
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, bytes] = {}
+        self.reads: list[str] = []
+
+    async def mget(self, *keys):
+        keys = keys[0] if len(keys) == 1 and isinstance(keys[0], list) else keys
+        self.reads.extend(keys)
+        return [self.values.get(key) for key in keys]
+
+    def publish(self, script_id: str, time_window: int, chunks: list[bytes]) -> None:
+        hashes = {str(idx): hash_chunk(chunk) for idx, chunk in enumerate(chunks)}
+        for chunk in chunks:
+            self.values[chunk_blob_key(hash_chunk(chunk))] = chunk
+        self.values[metadata_key(script_id, time_window)] = json.dumps(
+            {"chunks": hashes}
+        )
+        self.values[manifest_key(script_id, time_window)] = json.dumps({})
+
+
+def test_window_is_read_once_and_bodies_reused(monkeypatch) -> None:
+    """Test that a window is loaded once and known bodies are not fetched again"""
+    monkeypatch.setattr(chunk_cache, "current_window", lambda: 11)
+
+    async def run() -> None:
+        r = FakeRedis()
+        cache = WindowChunkCache()
+        r.publish("script", 10, [b"a", b"b"])
+        r.publish("script", 11, [b"a", b"c"])
+
+        window = await cache.get_window(r, "script", 10)
+        assert window["chunks"] == {"0": b"a", "1": b"b"}
+        assert await cache.get_window(r, "script", 10) is window
+
+        r.reads.clear()
+        window = await cache.get_window(r, "script", 11)
+        assert window["chunks"] == {"0": b"a", "1": b"c"}
+        assert chunk_blob_key(hash_chunk(b"a")) not in r.reads
+        assert ("script", 10) not in cache._windows
+
+    asyncio.run(run())
+
+
+def test_windows_of_idle_scripts_are_dropped(monkeypatch) -> None:
+    """Test that loading any window drops windows older than the previous one"""
+    window_now = 10
+    monkeypatch.setattr(chunk_cache, "current_window", lambda: window_now)
+
+    async def run() -> None:
+        nonlocal window_now
+        r = FakeRedis()
+        cache = WindowChunkCache()
+        r.publish("idle", 10, [b"a"])
+        r.publish("busy", 11, [b"b"])
+        r.publish("busy", 12, [b"b"])
+        await cache.get_window(r, "idle", 10)
+
+        window_now = 11
+        await cache.get_window(r, "busy", 11)
+        assert ("idle", 10) in cache._windows
+
+        window_now = 12
+        await cache.get_window(r, "busy", 12)
+        assert list(cache._windows) == [("busy", 12)]
+        assert list(cache._locks) == [("busy", 12)]
+
+    asyncio.run(run())
+
+
+def test_unpublished_window_is_not_cached(monkeypatch) -> None:
+    """Test that a window missing from Redis, or missing a body, returns None"""
+    monkeypatch.setattr(chunk_cache, "current_window", lambda: 10)
+
+    async def run() -> None:
+        r = FakeRedis()
+        cache = WindowChunkCache()
+        assert await cache.get_window(r, "script", 10) is None
+
+        r.publish("script", 10, [b"a"])
+        del r.values[chunk_blob_key(hash_chunk(b"a"))]
+        assert await cache.get_window(r, "script", 10) is None
+        assert cache._windows == {}
+
+    asyncio.run(run())
@@ -0,0 +1,157 @@
+from app.utils.chunking_utils import (
+    _pick_split,
+    _split_points,
+    chunk_spans,
+    hash_chunk,
+    rechunk_lua_source,
+    render_chunks,
+)
+from app.utils.lua_lexer import iter_tokens
+
+SOURCE = b"""local greeting = "hello, world"
+local long = [[
+a long string that must never be cut
+in the middle ]]
+-- a comment that stays whole
+local function add(a, b)
+    return a + b
+end
+print(add(1, 2), greeting, long)
+"""
+
+
+def significant_tokens(source: bytes) -> list[bytes]:
+    return [
+        source[start:end]
+        for kind, start, end in iter_tokens(source)
+        if kind not in ("whitespace", "comment")
+    ]
+
+
+def test_lexer_covers_source() -> None:
+    """Test that tokens tile the source without gaps"""
+    position = 0
+    for _, start, end in iter_tokens(SOURCE):
+        assert start == position
+        position = end
+    assert position == len(SOURCE)
+
+
+def test_lexer_long_brackets_and_escapes() -> None:
+    """Test that long strings, long comments and \\z strings are one token"""
+    source = b'--[==[ a ]] b ]==] x = [[ ]] ] ]] .. "a\\z\n   b"'
+    tokens = [(kind, source[start:end]) for kind, start, end in iter_tokens(source)]
+
+    assert ("comment", b"--[==[ a ]] b ]==]") in tokens
+    assert ("string", b"[[ ]] ]") not in tokens
+    assert ("string", b"[[ ]]") in tokens
+    assert ("string", b'"a\\z\n   b"') in tokens
+
+
+def test_chunk_spans_respect_budget_and_tokens() -> None:
+    """Test that chunks stay within budget and only cut between tokens"""
+    source = SOURCE * 20
+    split_points = {(cut, start) for cut, start, _ in _split_points(source)}
+
+    for target_bytes in (16, 64, 256, 1024):
+        spans = chunk_spans(source, target_bytes)
+
+        assert spans[0][0] == 0
+        assert spans[-1][1] == len(source)
+        for (_, end), (next_start, _) in zip(spans, spans[1:]):
+            assert (end, next_start) in split_points
+
+        for start, end in spans:
+            chunk_tokens = list(iter_tokens(source[start:end]))
+            assert end - start <= target_bytes or len(chunk_tokens) == 1
+
+        joined = b"\n".join(source[start:end] for start, end in spans)
+        assert significant_tokens(joined) == significant_tokens(source)
+
+
+def test_chunk_spans_never_split_before_call() -> None:
+    """Test that chunks never start with an opening parenthesis"""
+    source = b"f (a) g(b) h (c) " * 10
+
+    for start, _ in chunk_spans(source, 8):
+        assert source[start : start + 1] != b"("
+
+
+def test_chunk_spans_small_source() -> None:
+    """Test that a source within budget is one chunk"""
+    assert chunk_spans(b"return 1", 1024) == [(0, 8)]
+
+
+def test_chunk_spans_budget_holds_at_end_of_source() -> None:
+    """Test that the last chunk is split too when the source ends past budget"""
+    assert chunk_spans(b"a = 1\nb = 2", 8) == [(0, 5), (6, 11)]
+
+
+def test_pick_split_prefers_newlines() -> None:
+    """Test that a newline filling half the budget beats later splits"""
+    candidates = [(10, 11, 2), (14, 15, 1), (18, 18, 0)]
+
+    assert _pick_split(candidates, 0, 20) == (10, 11, 2)
+    assert _pick_split(candidates, 0, 28) == (14, 15, 1)
+    assert _pick_split(candidates, 0, 40) == (18, 18, 0)
+    assert _pick_split([], 0, 20) is None
+
+
+def generated_source(functions: int) -> bytes:
+    return b"".join(
+        b"local function f%d(a, b)\n    local s = \"value %d\"\n"
+        b"    return a * %d + b, s\nend\n" % (idx, idx, idx)
+        for idx in range(functions)
+    )
+
+
+def assert_valid_spans(source: bytes, spans: list, target_bytes: int) -> None:
+    split_points = {(cut, start) for cut, start, _ in _split_points(source)}
+
+    assert spans[0][0] == 0 and spans[-1][1] == len(source)
+    for (_, end), (next_start, _) in zip(spans, spans[1:]):
+        assert (end, next_start) in split_points
+    for start, end in spans:
+        assert end - start <= target_bytes
+
+
+def test_rechunk_matches_full_chunking() -> None:
+    """Test that re-chunked sources are as valid as fully chunked ones"""
+    old_source = generated_source(60)
+    old_spans = chunk_spans(old_source, 256)
+    middle = len(old_source) // 2
+    line_end = old_source.index(b"\n", middle) + 1
+
+    edits = [
+        old_source[:line_end] + b"print('inserted')\n" + old_source[line_end:],
+        old_source[:middle] + old_source[middle + 40 :],
+        old_source.replace(b"value 7\"", b"value seven\"", 1),
+        b"-- header\n" + old_source,
+        old_source + b"return f1\n",
+        old_source,
+    ]
+
+    for new_source in edits:
+        spans = rechunk_lua_source(old_source, old_spans, new_source, 256)
+        full_spans = chunk_spans(new_source, 256)
+
+        assert_valid_spans(new_source, spans, 256)
+        assert significant_tokens(
+            "\n".join(render_chunks(new_source, spans)).encode()
+        ) == significant_tokens(new_source)
+        assert len(spans) <= len(full_spans) + 2
+
+
+def test_rechunk_keeps_unchanged_chunks() -> None:
+    """Test that inserting a line only replaces the chunks around it"""
+    old_source = generated_source(60)
+    old_spans = chunk_spans(old_source, 256)
+    line_end = old_source.index(b"\n", len(old_source) // 2) + 1
+    new_source = old_source[:line_end] + b"print('inserted')\n" + old_source[line_end:]
+
+    new_spans = rechunk_lua_source(old_source, old_spans, new_source, 256)
+    old_hashes = {hash_chunk(c) for c in render_chunks(old_source, old_spans)}
+    new_hashes = [hash_chunk(c) for c in render_chunks(new_source, new_spans)]
+
+    assert sum(digest not in old_hashes for digest in new_hashes) <= 2
+    assert rechunk_lua_source(old_source, old_spans, old_source, 256) == old_spans
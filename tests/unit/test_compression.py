@@ -0,0 +1,43 @@
+import pytest
+
+from app.services.script_registry import ScriptRegistry
+from app.utils import compression_utils
+from app.utils.compression_utils import (
+    CHUNK_CODECS,
+    check_codec,
+    compress_chunk,
+    decompress_chunk,
+)
+from app.utils.framing import CODEC_IDS
+
+CHUNK = b"local function f(a, b) return a + b end\n" * 50
+
+
+@pytest.mark.parametrize("codec", CHUNK_CODECS)
+def test_compress_round_trip(codec: str) -> None:
+    """Test that every codec decompresses back to the original chunk"""
+    if codec == "zstd" and compression_utils.zstandard is None:
+        pytest.skip("zstandard is not installed")
+
+    compressed = compress_chunk(CHUNK, codec, 6)
+
+    assert decompress_chunk(compressed, codec) == CHUNK
+    if codec != "none":
+        assert len(compressed) < len(CHUNK)
+
+
+def test_every_codec_can_be_framed() -> None:
+    """Test that binary frames have an id for every codec"""
+    assert set(CODEC_IDS) == set(CHUNK_CODECS)
+
+
+def test_unknown_codec_fails_at_startup(monkeypatch) -> None:
+    """Test that a bad CHUNK_COMPRESSION is rejected when the registry is made"""
+    with pytest.raises(ValueError):
+        check_codec("brotli")
+    with pytest.raises(ValueError):
+        ScriptRegistry(compression="brotli", transform_workers=0)
+
+    monkeypatch.setattr(compression_utils, "zstandard", None)
+    with pytest.raises(RuntimeError):
+        check_codec("zstd")
@@ -0,0 +1,17 @@
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+
+
+def test_chunk_ttl_follows_the_window_length() -> None:
+    """Test that windows stay in Redis for three windows unless overridden"""
+    assert Settings(CHUNK_WINDOW_SECONDS=60).chunk_ttl_seconds == 180
+    assert Settings(CHUNK_WINDOW_SECONDS=300).chunk_ttl_seconds == 900
+    assert Settings(CHUNK_TTL_SECONDS=600).chunk_ttl_seconds == 600
+
+
+def test_chunk_ttl_shorter_than_a_window_is_rejected() -> None:
+    """Test that a TTL expiring metadata within its window fails at startup"""
+    with pytest.raises(ValidationError):
+        Settings(CHUNK_WINDOW_SECONDS=300, CHUNK_TTL_SECONDS=180)
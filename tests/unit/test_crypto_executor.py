@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.crypto_executor import CryptoExecutor, CryptoExecutorBusy
+
+
+def fail() -> None:
+    raise RuntimeError("boom")
+
+
+def test_full_executor_rejects_with_retry_after() -> None:
+    """Test that bounded work beyond workers + queue_size gets a 503"""
+
+    async def run() -> None:
+        executor = CryptoExecutor("thread", workers=1, queue_size=1, retry_after=3)
+        release = threading.Event()
+        running = [
+            asyncio.ensure_future(executor.submit(release.wait)) for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(CryptoExecutorBusy) as busy:
+            await executor.submit(release.wait)
+        assert busy.value.status_code == 503
+        assert busy.value.headers == {"Retry-After": "3"}
+        with pytest.raises(CryptoExecutorBusy):
+            executor.check_capacity()
+
+        # Already admitted work is never rejected
+        unbounded = asyncio.ensure_future(executor.submit(len, b"abc", bounded=False))
+        release.set()
+        assert await unbounded == 3
+        await asyncio.gather(*running)
+
+        assert executor._in_flight == 0
+        executor.check_capacity()
+        executor.shutdown()
+
+    asyncio.run(run())
+
+
+def test_failing_task_frees_its_slot() -> None:
+    """Test that a task raising an exception is no longer counted in flight"""
+
+    async def run() -> None:
+        executor = CryptoExecutor("thread", workers=1, queue_size=0)
+
+        with pytest.raises(RuntimeError):
+            await executor.submit(fail)
+
+        assert executor._in_flight == 0
+        assert await executor.submit(len, b"abc") == 3
+        executor.shutdown()
+
+    asyncio.run(run())
+
+
+def test_unknown_kind_is_rejected() -> None:
+    """Test that CRYPTO_EXECUTOR only accepts thread or process"""
+    with pytest.raises(ValueError):
+        CryptoExecutor("fiber")
@@ -0,0 +1,103 @@
+import struct
+
+from starlette.requests import Request
+
+from app.utils.framing import (
+    CODEC_IDS,
+    FLAG_RECORD_SIGNATURES,
+    FLAG_TRAILING_SIGNATURE,
+    FRAME_VERSION,
+    encode_frame,
+    encode_header,
+    encode_record,
+    wants_binary,
+)
+
+
+def make_request(accept: str) -> Request:
+    return Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+
+
+def read_signature(frame: bytes, offset: int) -> tuple[bytes, int]:
+    (length,) = struct.unpack_from(">H", frame, offset)
+    offset += 2
+    return frame[offset : offset + length], offset + length
+
+
+def decode_frame(frame: bytes) -> dict:
+    version, codec, flags, window, count = struct.unpack_from(">BBBQI", frame)
+    offset = struct.calcsize(">BBBQI")
+
+    records = []
+    for _ in range(count):
+        index, nonce, length = struct.unpack_from(">I12sI", frame, offset)
+        offset += struct.calcsize(">I12sI")
+        ciphertext = frame[offset : offset + length]
+        offset += length
+
+        signature = None
+        if flags & FLAG_RECORD_SIGNATURES:
+            signature, offset = read_signature(frame, offset)
+        records.append((index, nonce, ciphertext, signature))
+
+    trailer = None
+    if flags & FLAG_TRAILING_SIGNATURE:
+        trailer, offset = read_signature(frame, offset)
+
+    assert offset == len(frame)
+    return {
+        "version": version,
+        "codec": codec,
+        "flags": flags,
+        "window": window,
+        "records": records,
+        "trailer": trailer,
+    }
+
+
+def test_frame_round_trip() -> None:
+    """Test that a frame decodes to its records and trailing signature"""
+    records = [(0, b"n" * 12, b"first"), (7, b"m" * 12, b"")]
+    frame = encode_frame(2**40, "zlib", records, signature=b"sig")
+
+    decoded = decode_frame(frame)
+    assert decoded["version"] == FRAME_VERSION
+    assert decoded["codec"] == CODEC_IDS["zlib"]
+    assert decoded["flags"] == FLAG_TRAILING_SIGNATURE
+    assert decoded["window"] == 2**40
+    assert decoded["records"] == [(i, n, c, None) for i, n, c in records]
+    assert decoded["trailer"] == b"sig"
+
+
+def test_frame_without_signature() -> None:
+    """Test that an unsigned frame has no flags and no trailer"""
+    decoded = decode_frame(encode_frame(1, "none", [(3, b"x" * 12, b"data")]))
+
+    assert decoded["flags"] == 0
+    assert decoded["trailer"] is None
+
+
+def test_records_with_signatures() -> None:
+    """Test streamed records carrying their own signature"""
+    frame = encode_header(5, "none", 2, FLAG_RECORD_SIGNATURES)
+    frame += encode_record(0, b"a" * 12, b"one", b"s1")
+    frame += encode_record(1, b"b" * 12, b"two", b"s2")
+
+    decoded = decode_frame(frame)
+    assert [record[3] for record in decoded["records"]] == [b"s1", b"s2"]
+
+
+def test_wants_binary() -> None:
+    """Test Accept negotiation of the binary media type"""
+    assert wants_binary(make_request("application/octet-stream"))
+    assert wants_binary(
+        make_request("application/json;q=0.5, application/octet-stream")
+    )
+    assert wants_binary(make_request("Application/Octet-Stream; q=0.1"))
+
+    assert not wants_binary(make_request("application/octet-stream;q=0"))
+    assert not wants_binary(make_request("application/octet-stream; q=0.0"))
+    assert not wants_binary(make_request("application/json"))
+    assert not wants_binary(make_request("*/*"))
+    assert not wants_binary(make_request("application/octet-streamx"))
+    assert not wants_binary(make_request(""))
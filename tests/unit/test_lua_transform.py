@@ -0,0 +1,125 @@
+from app.utils.lua_lexer import iter_tokens
+from app.utils.lua_transform import (
+    _decode_string,
+    _needs_space,
+    _significant_tokens,
+    _Token,
+    encode_strings,
+    transform_lua,
+)
+
+
+def names(source: bytes) -> list[bytes]:
+    return [
+        source[start:end]
+        for kind, start, end in iter_tokens(source)
+        if kind == "name"
+    ]
+
+
+def test_rename_locals_only() -> None:
+    """Test that locals and parameters are renamed but globals and fields kept"""
+    source = b"""
+local count = 0
+function bump(step)
+    local total = count + step
+    count = total
+    return total
+end
+print(count, other.count, other:count(), {count = 1, [count] = 2})
+"""
+    output = transform_lua(source, rename=True, encode=False)
+    output_names = names(output)
+
+    for global_name in (b"bump", b"print", b"other"):
+        assert global_name in output_names
+    for local_name in (b"step", b"total"):
+        assert local_name not in output_names
+
+    # Only the field, the method and the table key still read "count"
+    assert output_names.count(b"count") == 3
+    assert b".count" in output and b":count(" in output and b"{count=" in output
+
+
+def test_local_shadowing_a_global_is_kept() -> None:
+    """Test that a name also used as a global is never renamed"""
+    source = b"""
+local function f() local value = 1 return value end
+value = 2
+print(f(), value)
+"""
+    output = transform_lua(source, rename=True, encode=False)
+
+    assert names(output).count(b"value") == 4
+
+
+def test_local_visible_only_after_its_statement() -> None:
+    """Test that ``local x = x`` keeps the global on the right-hand side"""
+    output = transform_lua(b"local x = x + 1 print(x)", rename=True, encode=False)
+
+    assert names(output).count(b"x") == 3
+
+
+def test_rename_is_deterministic_and_salted() -> None:
+    """Test that aliases only depend on the name and the salt"""
+    source = b"local secret = 1 return secret"
+
+    assert transform_lua(source, salt="a") == transform_lua(source, salt="a")
+    assert transform_lua(source, salt="a") != transform_lua(source, salt="b")
+
+
+def test_decode_string_escapes() -> None:
+    """Test decoding of short and long string literals"""
+    assert _decode_string(b'"a\\tb\\\\\\"c"') == b'a\tb\\"c'
+    assert _decode_string(b"'\\65\\x41\\u{41}\\u{E9}'") == b"AAA\xc3\xa9"
+    assert _decode_string(b'"a\\z  \n  b"') == b"ab"
+    assert _decode_string(b'"line\\\nnext"') == b"line\nnext"
+    assert _decode_string(b"[==[\nfirst\r\nsecond]]]==]") == b"first\nsecond]]"
+
+    assert _decode_string(b'"\\256"') is None
+    assert _decode_string(b'"\\q"') is None
+    assert _decode_string(b'"unterminated') is None
+
+
+def test_encode_strings_round_trip() -> None:
+    """Test that encoded strings decode to the original value"""
+    literals = [b'"hello"', b"'it\\'s'", b"[[\nraw \\n text]]", b'"\\u{1F600}"']
+    tokens = [_Token("string", literal) for literal in literals]
+    encode_strings(tokens)
+
+    for literal, token in zip(literals, tokens):
+        if _decode_string(literal) is None:
+            assert token.text == literal
+            continue
+        assert token.text.startswith(b'"\\')
+        assert _decode_string(token.text) == _decode_string(literal)
+
+
+def test_needs_space() -> None:
+    """Test where minification has to keep a space between tokens"""
+
+    def needs_space(first: bytes, second: bytes) -> bool:
+        [previous] = _significant_tokens(first)
+        [token] = _significant_tokens(second)
+        return _needs_space(previous, token)
+
+    assert needs_space(b"local", b"x")
+    assert needs_space(b"10", b"local")
+    assert needs_space(b"1", b"..")
+    assert needs_space(b"-", b"-")
+    assert needs_space(b".", b"..")
+
+    assert not needs_space(b"x", b"=")
+    assert not needs_space(b")", b"end")
+    assert not needs_space(b'"s"', b"x")
+
+
+def test_minify_keeps_tokens_and_shebang() -> None:
+    """Test that minification only drops whitespace and comments"""
+    source = b"#!/usr/bin/lua\nlocal a = 1 -- one\nreturn a .. 2 - -1\n"
+    output = transform_lua(source, rename=False, encode=False)
+
+    assert output.startswith(b"#!/usr/bin/lua\n")
+    assert [t.text for t in _significant_tokens(output.split(b"\n", 1)[1])] == [
+        t.text for t in _significant_tokens(source.split(b"\n", 1)[1])
+    ]
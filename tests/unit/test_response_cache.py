@@ -0,0 +1,54 @@
+from app.utils.response_cache import _ENTRY_OVERHEAD_BYTES, SessionResponseCache
+
+SEALED = (b"n" * 12, b"c" * 100, None)
+
+
+def test_get_returns_what_was_put() -> None:
+    """Test that a retry gets the very same sealed chunk back"""
+    cache = SessionResponseCache(max_bytes=1024 * 1024)
+    cache.put("token", "script", 10, 3, SEALED)
+
+    assert cache.get("token", "script", 10, 3) == SEALED
+    assert cache.get("other-token", "script", 10, 3) is None
+    assert cache.get("token", "script", 10, 4) is None
+    assert cache.get("token", "other-script", 10, 3) is None
+
+
+def test_new_window_drops_older_windows() -> None:
+    """Test that caching a newer window evicts the script's older ones"""
+    cache = SessionResponseCache(max_bytes=1024 * 1024)
+    cache.put("token", "script", 10, 0, SEALED)
+    cache.put("token", "other-script", 10, 0, SEALED)
+    cache.put("token", "script", 11, 0, SEALED)
+
+    assert cache.get("token", "script", 10, 0) is None
+    assert cache.get("token", "script", 11, 0) == SEALED
+    assert cache.get("token", "other-script", 10, 0) == SEALED
+
+    # A late put for an already superseded window is not cached
+    cache.put("token", "script", 10, 1, SEALED)
+    assert cache.get("token", "script", 10, 1) is None
+
+
+def test_byte_bound_evicts_least_recently_used() -> None:
+    """Test that the cache stays within max_bytes, evicting LRU first"""
+    entry_size = _ENTRY_OVERHEAD_BYTES + sum(len(part or b"") for part in SEALED)
+    cache = SessionResponseCache(max_bytes=entry_size * 2)
+
+    cache.put("token", "script", 10, 0, SEALED)
+    cache.put("token", "script", 10, 1, SEALED)
+    assert cache.get("token", "script", 10, 0) == SEALED
+
+    cache.put("token", "script", 10, 2, SEALED)
+    assert cache.get("token", "script", 10, 1) is None
+    assert cache.get("token", "script", 10, 0) == SEALED
+    assert cache.get("token", "script", 10, 2) == SEALED
+    assert cache._size <= cache.max_bytes
+
+
+def test_disabled_cache() -> None:
+    """Test that max_bytes=0 disables the cache"""
+    cache = SessionResponseCache(max_bytes=0)
+    cache.put("token", "script", 10, 0, SEALED)
+
+    assert cache.get("token", "script", 10, 0) is None
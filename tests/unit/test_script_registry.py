@@ -0,0 +1,48 @@
+import asyncio
+
+from app.services.script_registry import ScriptRegistry, script_generation_key
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, int] = {}
+
+    async def mget(self, keys: list[str]) -> list:
+        return [self.values.get(key) for key in keys]
+
+
+def test_watch_only_forces_reloads_on_new_generations(monkeypatch) -> None:
+    """Test that a generation bumped before a script was loaded is not forced"""
+
+    async def run() -> None:
+        r = FakeRedis()
+        r.values[script_generation_key("script")] = 3
+        registry = ScriptRegistry(transform_workers=0)
+        loaded = ["script"]
+        reloads = []
+        monkeypatch.setattr(registry, "loaded_scripts", lambda: list(loaded))
+        monkeypatch.setattr(
+            registry, "reload", lambda s, forced: reloads.append((s, forced))
+        )
+
+        watcher = asyncio.ensure_future(registry.watch(r, 0.01))
+        await asyncio.sleep(0.035)
+        assert reloads and all(not forced for _, forced in reloads)
+
+        reloads.clear()
+        r.values[script_generation_key("script")] = 4
+        await asyncio.sleep(0.02)
+        assert reloads.count(("script", True)) == 1
+
+        # An evicted script is first seen again when it is loaded anew
+        loaded.clear()
+        await asyncio.sleep(0.02)
+        r.values[script_generation_key("script")] = 5
+        loaded.append("script")
+        reloads.clear()
+        await asyncio.sleep(0.02)
+        watcher.cancel()
+
+        assert ("script", True) not in reloads
+
+    asyncio.run(run())
@@ -0,0 +1,67 @@
+from app.utils.chunking_utils import diff_versions, script_version
+
+
+def apply_delta(old_chunks: list[str], delta: dict, new_chunks: list[str]) -> list:
+    """Rebuild the new version the way a client would from a delta"""
+    rebuilt = []
+    for idx in range(delta["count"]):
+        if idx in delta["changed"]:
+            rebuilt.append(new_chunks[idx])
+        elif str(idx) in delta["moved"]:
+            rebuilt.append(old_chunks[delta["moved"][str(idx)]])
+        else:
+            rebuilt.append(old_chunks[idx])
+    return rebuilt
+
+
+def test_identical_versions() -> None:
+    """Test that an unchanged script needs nothing"""
+    assert diff_versions(["a", "b"], ["a", "b"]) == {
+        "count": 2,
+        "changed": [],
+        "moved": {},
+    }
+
+
+def test_changed_chunks() -> None:
+    """Test that new content at an index is reported as changed"""
+    delta = diff_versions(["a", "b", "c"], ["a", "x", "c"])
+
+    assert delta == {"count": 3, "changed": [1], "moved": {}}
+
+
+def test_moved_chunks() -> None:
+    """Test that an insertion turns later chunks into moves, not downloads"""
+    old = ["a", "b", "c"]
+    new = ["a", "x", "b", "c"]
+    delta = diff_versions(old, new)
+
+    assert delta == {"count": 4, "changed": [1], "moved": {"2": 1, "3": 2}}
+    assert apply_delta(old, delta, new) == new
+
+
+def test_truncated_versions() -> None:
+    """Test that dropped trailing chunks only shrink the count"""
+    old = ["a", "b", "c"]
+    new = ["a", "b"]
+    delta = diff_versions(old, new)
+
+    assert delta == {"count": 2, "changed": [], "moved": {}}
+    assert apply_delta(old, delta, new) == new
+
+
+def test_deletion_and_duplicates() -> None:
+    """Test deletions and content repeated at several indices"""
+    old = ["a", "b", "a", "c"]
+    new = ["b", "a", "c", "c", "d"]
+    delta = diff_versions(old, new)
+
+    assert delta["changed"] == [4]
+    assert apply_delta(old, delta, new) == new
+
+
+def test_script_version_depends_on_order() -> None:
+    """Test that versions identify the ordered chunk hashes"""
+    assert script_version(["a", "b"]) == script_version(["a", "b"])
+    assert script_version(["a", "b"]) != script_version(["b", "a"])
+    assert len(script_version(["a"])) == 16
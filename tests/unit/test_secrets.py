@@ -0,0 +1,169 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import secrets
+from app.core.secrets import TokenManager, VaultClient, VerifiedTokenCache
+
+
+class StaticSecrets:
+    def __init__(self, **secrets: str) -> None:
+        self.secrets = secrets
+
+    def get_secret(self, name: str) -> str:
+        return self.secrets[name]
+
+
+def test_issued_claims_match_verified_claims() -> None:
+    """Test that the claims returned with a new token are the decoded ones"""
+    token_manager = TokenManager(
+        StaticSecrets(jwt_secret="secret", master_sym_key="master")
+    )
+    token, claims = token_manager.issue_token(1, "test_user")
+
+    verified = token_manager.verify_token(token)
+    session_key = token_manager.derive_session_key(claims)
+
+    assert claims == verified
+    assert session_key == token_manager.derive_session_key(verified)
+
+
+def claims(lifetime: float) -> dict:
+    return {"uid": 1, "username": "test_user", "exp": time.time() + lifetime}
+
+
+def test_verified_token_cache_hits_until_expiry() -> None:
+    """Test that cached claims are served until the token expires"""
+    cache = VerifiedTokenCache(max_entries=8)
+    cache.put("token", "secret", claims(60))
+    cache.put("expired", "secret", claims(-1))
+
+    assert cache.get("token", "secret")["uid"] == 1
+    assert cache.get("other", "secret") is None
+    assert cache.get("expired", "secret") is None
+
+
+def test_verified_token_cache_drops_entries_on_secret_change() -> None:
+    """Test that rotating the JWT secret forgets every verified token"""
+    cache = VerifiedTokenCache(max_entries=8)
+    cache.put("token", "secret", claims(60))
+
+    assert cache.get("token", "rotated") is None
+    assert cache.get("token", "secret") is None
+
+
+def test_verified_token_cache_evicts_least_recently_used() -> None:
+    """Test that the cache holds at most max_entries tokens"""
+    cache = VerifiedTokenCache(max_entries=2)
+    cache.put("first", "secret", claims(60))
+    cache.put("second", "secret", claims(60))
+    cache.get("first", "secret")
+    cache.put("third", "secret", claims(60))
+
+    assert cache.get("first", "secret") is not None
+    assert cache.get("second", "secret") is None
+    assert cache.get("third", "secret") is not None
+
+
+def test_verified_token_cache_skips_what_it_cannot_expire() -> None:
+    """Test that a disabled cache, or claims without exp, cache nothing"""
+    disabled = VerifiedTokenCache(max_entries=0)
+    disabled.put("token", "secret", claims(60))
+    assert disabled.get("token", "secret") is None
+
+    cache = VerifiedTokenCache(max_entries=8)
+    cache.put("token", "secret", {"uid": 1, "username": "test_user"})
+    assert cache.get("token", "secret") is None
+
+
+def test_verified_token_cache_returns_copies() -> None:
+    """Test that callers cannot alter the cached claims"""
+    cache = VerifiedTokenCache(max_entries=8)
+    cache.put("token", "secret", claims(60))
+    cache.get("token", "secret")["uid"] = 2
+
+    assert cache.get("token", "secret")["uid"] == 1
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class FlakyKV:
+    def __init__(self) -> None:
+        self.value = "first"
+        self.reads = 0
+        self.failing = False
+
+    def read_secret_version(self, path: str, mount_point: str) -> dict:
+        self.reads += 1
+        if self.failing:
+            raise ConnectionError("Vault is down")
+        return {"data": {"data": {"value": self.value}}}
+
+
+def vault_client(monkeypatch) -> tuple[VaultClient, FlakyKV, FakeClock]:
+    clock = FakeClock()
+    monkeypatch.setattr(secrets, "time", clock)
+    kv = FlakyKV()
+    client = VaultClient()
+    client.client = SimpleNamespace(secrets=SimpleNamespace(kv=SimpleNamespace(v2=kv)))
+    client.cache_ttl = 10
+    client.stale_seconds = 100
+    client.refresh_interval = 5
+    return client, kv, clock
+
+
+def test_secret_is_served_from_memory_within_ttl(monkeypatch) -> None:
+    """Test that a fresh secret is read from Vault once, then re-read after ttl"""
+    client, kv, clock = vault_client(monkeypatch)
+
+    assert client.get_secret("jwt_secret") == "first"
+    kv.value = "second"
+    clock.now += 9
+    assert client.get_secret("jwt_secret") == "first"
+    assert kv.reads == 1
+
+    clock.now += 1
+    assert client.get_secret("jwt_secret") == "second"
+    assert kv.reads == 2
+
+
+def test_stale_secret_is_served_while_vault_is_down(monkeypatch) -> None:
+    """Test that Vault is retried at most once per refresh interval"""
+    client, kv, clock = vault_client(monkeypatch)
+    client.get_secret("jwt_secret")
+    kv.failing = True
+
+    clock.now += 20
+    assert client.get_secret("jwt_secret") == "first"
+    assert kv.reads == 2
+    clock.now += 4
+    assert client.get_secret("jwt_secret") == "first"
+    assert kv.reads == 2
+    clock.now += 1
+    assert client.get_secret("jwt_secret") == "first"
+    assert kv.reads == 3
+
+    kv.failing = False
+    kv.value = "second"
+    clock.now += 5
+    assert client.get_secret("jwt_secret") == "second"
+
+
+def test_secret_fails_once_the_stale_window_passed(monkeypatch) -> None:
+    """Test that a value older than ttl + stale seconds is never served"""
+    client, kv, clock = vault_client(monkeypatch)
+    client.get_secret("jwt_secret")
+    kv.failing = True
+
+    clock.now += 110
+    with pytest.raises(Exception, match="Failed to retrieve secret jwt_secret"):
+        client.get_secret("jwt_secret")
+    with pytest.raises(Exception, match="Failed to retrieve secret master_sym_key"):
+        client.get_secret("master_sym_key")
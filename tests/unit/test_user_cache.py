@@ -0,0 +1,214 @@
+import asyncio
+import fnmatch
+import json
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import Session
+
+from app.models.auth import AuthorizedUser
+from app.services.user_cache import (
+    ALL_USERS,
+    INVALIDATION_CHANNEL,
+    AuthorizedUserCache,
+    authorized_user_cache,
+    authorized_user_key,
+)
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        self.expiries: dict[str, int] = {}
+        self.published: list[tuple[str, str]] = []
+
+    async def get(self, key: str):
+        return self.values.get(key)
+
+    async def set(self, key: str, value: str, ex: int = None) -> None:
+        self.values[key] = value
+        self.expiries[key] = ex
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.values.pop(key, None)
+
+    async def publish(self, channel: str, message: str) -> None:
+        self.published.append((channel, message))
+
+    async def scan_iter(self, match: str):
+        for key in list(self.values):
+            if fnmatch.fnmatch(key, match):
+                yield key
+
+    def pubsub(self) -> "FakePubSub":
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    def __init__(self, r: FakeRedis) -> None:
+        self.r = r
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, channel: str) -> None:
+        self.r.subscriber = self
+
+    async def get_message(self, ignore_subscribe_messages: bool, timeout: float):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self) -> None:
+        pass
+
+
+class CountingLoader:
+    def __init__(self, username=None) -> None:
+        self.username = username
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return self.username
+
+
+def test_unknown_users_are_cached_briefly() -> None:
+    """Test that an unknown id is cached in both tiers with the negative ttl"""
+
+    async def run() -> None:
+        r = FakeRedis()
+        cache = AuthorizedUserCache(ttl=300, negative_ttl=30, memory_ttl=10)
+        cache.bind(r)
+        load = CountingLoader()
+
+        assert await cache.get_username(7, load) is None
+        assert await cache.get_username(7, load) is None
+        assert load.calls == 1
+        assert json.loads(r.values[authorized_user_key(7)]) == {"username": None}
+        assert r.expiries[authorized_user_key(7)] == 30
+
+        # Another worker finds the negative entry in Redis
+        other = AuthorizedUserCache()
+        other.bind(r)
+        assert await other.get_username(7, load) is None
+        assert load.calls == 1
+
+    asyncio.run(run())
+
+
+def test_concurrent_misses_load_once() -> None:
+    """Test that concurrent lookups of one id share a single database read"""
+
+    async def run() -> None:
+        cache = AuthorizedUserCache()
+        cache.bind(FakeRedis())
+        load = CountingLoader("test_user")
+
+        usernames = await asyncio.gather(
+            *(cache.get_username(1, load) for _ in range(10))
+        )
+
+        assert usernames == ["test_user"] * 10
+        assert load.calls == 1
+
+    asyncio.run(run())
+
+
+def test_invalidate_clears_both_tiers_and_broadcasts() -> None:
+    """Test that an invalidation reaches memory, Redis and the channel"""
+
+    async def run() -> None:
+        r = FakeRedis()
+        cache = AuthorizedUserCache()
+        cache.bind(r)
+        load = CountingLoader("test_user")
+        await cache.get_username(1, load)
+        await cache.get_username(2, load)
+
+        cache.invalidate([1])
+        await asyncio.sleep(0.01)
+
+        assert authorized_user_key(1) not in r.values
+        assert authorized_user_key(2) in r.values
+        assert r.published == [(INVALIDATION_CHANNEL, json.dumps([1]))]
+        await cache.get_username(1, load)
+        await cache.get_username(2, load)
+        assert load.calls == 3
+
+        cache.invalidate_all()
+        await asyncio.sleep(0.01)
+        assert r.values == {}
+
+    asyncio.run(run())
+
+
+def test_listener_applies_broadcast_invalidations() -> None:
+    """Test that invalidations from other workers reach this worker's memory"""
+
+    async def run() -> None:
+        r = FakeRedis()
+        cache = AuthorizedUserCache()
+        cache.bind(r)
+        load = CountingLoader("test_user")
+        listener = asyncio.ensure_future(cache.listen())
+        await asyncio.sleep(0.01)
+
+        await cache.get_username(1, load)
+        await r.delete(authorized_user_key(1))
+        await r.subscriber.messages.put({"data": json.dumps([1])})
+        await asyncio.sleep(0.01)
+        await cache.get_username(1, load)
+        listener.cancel()
+
+        assert load.calls == 2
+
+    asyncio.run(run())
+
+
+def test_invalidation_during_load_is_not_cached_over() -> None:
+    """Test that a value read before an invalidation is not cached after it"""
+
+    async def run() -> None:
+        r = FakeRedis()
+        cache = AuthorizedUserCache()
+        cache.bind(r)
+        load = CountingLoader("old_name")
+
+        lookup = asyncio.ensure_future(cache.get_username(1, load))
+        await asyncio.sleep(0.005)
+        cache._forget([1])
+
+        assert await lookup == "old_name"
+        assert r.values == {}
+        load.username = "new_name"
+        assert await cache.get_username(1, load) == "new_name"
+
+    asyncio.run(run())
+
+
+def test_commits_invalidate_written_users(monkeypatch) -> None:
+    """Test that only committed ORM writes invalidate, bulk writes everyone"""
+    invalidated = []
+    monkeypatch.setattr(
+        authorized_user_cache, "invalidate", lambda ids: invalidated.append(ids)
+    )
+    engine = create_engine("sqlite://")
+    AuthorizedUser.__table__.create(engine)
+
+    with Session(engine) as session:
+        session.add(AuthorizedUser(user_id=1, username="test_user"))
+        session.flush()
+        assert invalidated == []
+        session.commit()
+        assert invalidated == [{1}]
+
+        session.add(AuthorizedUser(user_id=2, username="other_user"))
+        session.flush()
+        session.rollback()
+        session.commit()
+        assert invalidated == [{1}]
+
+        session.execute(delete(AuthorizedUser).where(AuthorizedUser.user_id == 1))
+        session.commit()
+        assert invalidated == [{1}, {ALL_USERS}]